@@ -53,24 +53,90 @@ class ArgParser(object):
                             help='input batch size')
         parser.add_argument('--workers', default=32, type=int,
                             help='number of data loading workers')
+        parser.add_argument('--io_threads', default=0, type=int,
+                            help="threads per loader worker issuing the frame and "
+                                 "audio reads of an item concurrently, 0 to read "
+                                 "them one after the other")
+        parser.add_argument('--stack_collate', default=0, type=int,
+                            help="batch the sources of each mixture as BxNx... "
+                                 "tensors, so net_frame runs once over all of them")
+        parser.add_argument('--pin_memory', default=0, type=int,
+                            help="page-locked train batches, for faster copies to GPU")
         parser.add_argument('--num_val', default=-1, type=int,
                             help='number of images to evalutate')
         parser.add_argument('--num_vis', default=40, type=int,
                             help='number of images to evalutate')
+        parser.add_argument('--val_cache', default='',
+                            help="root for validation items materialized once "
+                                 "and reused by every evaluation, '' to disable")
+        parser.add_argument('--quarantine', default='',
+                            help="csv of training samples that failed to load "
+                                 "repeatedly, skipped in later runs")
 
         parser.add_argument('--audLen', default=65535, type=int,
                             help='sound length')
         parser.add_argument('--audRate', default=11025, type=int,
                             help='sound sampling rate')
+        parser.add_argument('--audio_mode', default='decode',
+                            choices=['decode', 'store', 'window'],
+                            help="decode audio files, slice PCM from audio_store, "
+                                 "or decode only the crop window using audio_stats")
+        parser.add_argument('--audio_store', default='./data/pcm',
+                            help="root of the decoded PCM store")
+        parser.add_argument('--audio_stats', default='./data/audio_stats.csv',
+                            help="per-file rate/length/peak for windowed decoding, "
+                                 "not needed with .npz manifests")
+        parser.add_argument('--resample', default='librosa',
+                            choices=['nearest', 'fast', 'hq', 'librosa'],
+                            help="resampler for audio above audRate: stride, "
+                                 "short/long polyphase FIR, or librosa; all only "
+                                 "resample the crop window (scripts/bench_resample.py)")
+        parser.add_argument('--clip_cache_mb', default=0, type=int,
+                            help="shared memory (MB) for decoded audio and resized "
+                                 "frames reused across train workers, 0 to disable")
         parser.add_argument('--stft_frame', default=1022, type=int,
                             help="stft frame length")
         parser.add_argument('--stft_hop', default=256, type=int,
                             help="stft hop length")
+        parser.add_argument('--stft_device', default=0, type=int,
+                            help="compute spectrograms on the training device, "
+                                 "loaders only return waveforms")
+
 
         parser.add_argument('--imgSize', default=224, type=int,
                             help='size of input frame')
         parser.add_argument('--frameRate', default=8, type=float,
                             help='video frame sampling rate')
+        parser.add_argument('--jpeg_draft', default=1, type=int,
+                            help="decode JPEGs at the smallest DCT scale that "
+                                 "still covers the resize target")
+        parser.add_argument('--frame_decoder', default='pil',
+                            choices=['pil', 'torchvision'],
+                            help="decode frames one by one with PIL, or all frames "
+                                 "of a clip in one torchvision.io.decode_jpeg call "
+                                 "(no jpeg_draft, scripts/bench_frame_decoder.py)")
+        parser.add_argument('--frames_device', default=0, type=int,
+                            help="crop/flip/normalize frames on the training device, "
+                                 "loaders only return uint8 frames")
+        parser.add_argument('--frame_mode', default='jpg',
+                            choices=['jpg', 'store', 'pack'],
+                            help="decode JPEG frames, read resized frames from frame_store, "
+                                 "or decode JPEGs from one .pack file per video")
+        parser.add_argument('--frame_store', default='./data/frames_store',
+                            help="root of the resized frame store")
+
+        parser.add_argument('--storage', default='',
+                            help="read JPEGs, frame packs and audio files from "
+                                 "s3://bucket/prefix instead of local paths")
+        parser.add_argument('--storage_endpoint', default='',
+                            help="endpoint url of an S3 compatible store, "
+                                 "'' for AWS")
+        parser.add_argument('--storage_cache', default='',
+                            help="local dir keeping a copy of every object read "
+                                 "from --storage, '' to disable")
+        parser.add_argument('--storage_pool', default=16, type=int,
+                            help="connections (and concurrent requests) per "
+                                 "loader worker with --storage")
 
         # Misc arguments
         parser.add_argument('--seed', default=1234, type=int,
@@ -95,6 +161,26 @@ class ArgParser(object):
                             default='data/val.csv')
         parser.add_argument('--dup_trainset', default=100, type=int,
                             help='duplicate so that one epoch has more iters')
+        parser.add_argument('--mix_in_batch', default=0, type=int,
+                            help="load single-source clips and mix them within "
+                                 "the batch on the device")
+        parser.add_argument('--mix_pairings', default=1, type=int,
+                            help="with --mix_in_batch, mixtures built per loaded "
+                                 "clip, the batch holds batch_size*mix_pairings mixtures")
+        parser.add_argument('--shards', default='',
+                            help="root of tar shards from scripts/create_shards.py, "
+                                 "streamed instead of list_train ('' to disable)")
+        parser.add_argument('--shard_buffer', default=1000, type=int,
+                            help="records in the shuffle buffer of each loader worker")
+        parser.add_argument('--resume_epoch', default=1, type=int,
+                            help="epoch to resume a run at, from the state_latest.pth "
+                                 "of its checkpoint dir")
+        parser.add_argument('--resume_batch', default=0, type=int,
+                            help="batches of --resume_epoch already trained on, "
+                                 "skipped to resume mid-epoch")
+        parser.add_argument('--ckpt_iter', default=0, type=int,
+                            help="also save state_latest.pth every that many "
+                                 "batches, 0 for only at the end of each epoch")
 
         # optimization related arguments
         parser.add_argument('--num_epoch', default=100, type=int,
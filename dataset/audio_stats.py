@@ -0,0 +1,37 @@
+import csv
+import numpy as np
+import torchaudio
+
+
+def compute_audio_stats(path):
+    """Decode a file once, return (rate, num_samples, num_channels, peak).
+
+    The peak is taken on the mono mixdown, exactly as in load_audio_file,
+    so partial decoding can reuse it for the [-1, 1] normalization.
+    """
+    audio_raw, rate = torchaudio.load(path)
+    audio_raw = audio_raw.numpy().astype(np.float32)
+    num_channels, num_samples = audio_raw.shape
+    if num_channels == 2:
+        audio_raw = (audio_raw[0] + audio_raw[1]) / 2
+    else:
+        audio_raw = audio_raw[0]
+    peak = max(abs(audio_raw.min()), abs(audio_raw.max()))
+    return rate, num_samples, num_channels, float(peak)
+
+
+def load_audio_stats(filename):
+    """Read a stats csv of AUDIO_PATH,RATE,NUM_SAMPLES,NUM_CHANNELS,PEAK."""
+    stats = {}
+    for row in csv.reader(open(filename, 'r'), delimiter=','):
+        if len(row) < 5:
+            continue
+        stats[row[0]] = (int(row[1]), int(row[2]), int(row[3]), float(row[4]))
+    return stats
+
+
+def save_audio_stats(filename, stats):
+    with open(filename, 'w') as f:
+        writer = csv.writer(f)
+        for path, (rate, num_samples, num_channels, peak) in stats.items():
+            writer.writerow([path, rate, num_samples, num_channels, peak])
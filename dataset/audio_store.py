@@ -0,0 +1,47 @@
+import os
+import numpy as np
+
+from .open_files import OpenFiles
+
+
+def store_path(root, path, ext='.npy'):
+    """Map a dataset path (audio file or frame dir) to its file in a store.
+
+    Stores mirror the last two components of the original path,
+    i.e. ``<instrument>/<video>``, so train/val lists stay unchanged.
+    """
+    parts = os.path.normpath(path).split(os.sep)[-2:]
+    return os.path.join(root, *parts) + ext
+
+
+def write_track(root, path, audio, dtype='float32'):
+    """Save one mono track, already at audRate and in [-1, 1]."""
+    filename = store_path(root, path)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    if dtype == 'int16':
+        audio = np.clip(np.round(audio * 32767.), -32768, 32767)
+    audio = np.ascontiguousarray(audio, dtype=dtype)
+
+    # write to a temp file first, so readers never see half a track
+    tmp = filename + '.tmp.npy'
+    np.save(tmp, audio)
+    os.replace(tmp, filename)
+    return filename
+
+
+class AudioStore(object):
+    """Decoded PCM tracks, one memory-mapped .npy (float32 or int16) per video.
+
+    Slicing a track only touches the pages of the crop window,
+    no decoding or resampling is done at load time. The max_open most
+    recently used maps are kept open, per process.
+    """
+    def __init__(self, root, max_open=256):
+        self.root = root
+        self.tracks = OpenFiles(max_open)
+
+    def _open(self, path):
+        return np.load(store_path(self.root, path), mmap_mode='r')
+
+    def load(self, path):
+        return self.tracks.get(path, self._open)
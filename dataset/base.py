@@ -1,14 +1,59 @@
+import os
+import io
 import random
 import csv
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import torch
 import torch.utils.data as torchdata
 from torchvision import transforms
+from torchvision.io import decode_jpeg, read_file, ImageReadMode
 import torchaudio
 import librosa
 from PIL import Image
 
 from . import video_transforms as vtransforms
+from .audio_store import AudioStore
+from .audio_stats import load_audio_stats
+from .frame_store import FrameStore, VAL_EXT, split_frame_path
+from .frame_pack import FramePackReader
+from .manifest import Manifest, SampleTable
+from .failures import FailureRegistry
+from .clip_cache import SharedClipCache
+from .stft import STFT
+from .resample import Resampler
+from .storage import open_storage
+
+
+def load_audio_file(path, peak=None, storage=None):
+    # peak: precomputed max(abs) of the mono track, skips the scan
+    source = path if storage is None else storage.open(path)
+    if path.endswith('.mp3'):
+        audio_raw, rate = torchaudio.load(source)
+        # print(f"Initial shape: {audio_raw.shape}")
+            
+        # Convert to numpy
+        audio_raw = audio_raw.numpy().astype(np.float32)
+            
+        # Check and convert stereo to mono if needed
+        if audio_raw.shape[0] == 2:  # Stereo
+            audio_raw = (audio_raw[0] + audio_raw[1]) / 2
+        else:  # Mono
+            audio_raw = audio_raw[0]
+                
+        # print(f"Before normalization range: [{audio_raw.min():.3f}, {audio_raw.max():.3f}]")
+            
+        # Normalize to [-1, 1] range
+        if peak is None:
+            peak = max(abs(audio_raw.min()), abs(audio_raw.max()))
+        if peak > 1:
+            audio_raw = audio_raw / peak
+            
+        # print(f"After normalization range: [{audio_raw.min():.3f}, {audio_raw.max():.3f}]")
+            
+        return audio_raw, rate
+    else:
+        return librosa.load(source, sr=None, mono=True)
 
 
 class BaseDataset(torchdata.Dataset):
@@ -23,36 +68,85 @@ class BaseDataset(torchdata.Dataset):
         self.audSec = 1. * self.audLen / self.audRate
         self.binary_mask = opt.binary_mask
 
+        # where JPEGs, packs and audio files are read from: local paths
+        # or an object store
+        self.storage = open_storage(opt)
+
+        # frame source: JPEG files, a prebuilt store of resized frames,
+        # or one pack of JPEGs per video
+        self.frame_mode = opt.frame_mode
+        self.frame_store = None
+        if self.frame_mode == 'store':
+            # evaluation frames are stored at imgSize, resizing the
+            # training ones again would not match the JPEG path
+            ext = '.npy'
+            if split != 'train' and not opt.frames_device:
+                ext = VAL_EXT
+            self.frame_store = FrameStore(opt.frame_store, ext=ext)
+        self.frame_packs = None
+        if self.frame_mode == 'pack':
+            self.frame_packs = FramePackReader(
+                self.storage if self.storage.remote else None)
+
+        # audio source: decode files, or slice a prebuilt PCM store
+        self.audio_mode = opt.audio_mode
+        self.audio_store = None
+        if self.audio_mode == 'store':
+            self.audio_store = AudioStore(opt.audio_store)
+        self.audio_stats = {}
+
         # STFT params
         self.log_freq = opt.log_freq
         self.stft_frame = opt.stft_frame
         self.stft_hop = opt.stft_hop
         self.HS = opt.stft_frame // 2 + 1
         self.WS = (self.audLen + 1) // self.stft_hop
+        self.stft = STFT(self.stft_frame, self.stft_hop)
+        self.resampler = Resampler()
+        self.resample_quality = opt.resample
+        # return waveforms only, STFT runs on the training device
+        self.stft_device = opt.stft_device
 
         self.split = split
+        # decoded audio and resized frames, shared by the train workers
+        self.clip_cache = None
+        if opt.clip_cache_mb > 0 and split == 'train':
+            self.clip_cache = SharedClipCache(opt.clip_cache_mb << 20)
+        self.frames_device = opt.frames_device
+        self.jpeg_draft = opt.jpeg_draft
+        self.frame_decoder = opt.frame_decoder
         self.seed = opt.seed
         random.seed(self.seed)
 
         # initialize video transform
         self._init_vtransform()
 
-        # list_sample can be a python list or a csv file of list
-        if isinstance(list_sample, str):
+        # list_sample can be a python list, a csv file of list, or a
+        # binary manifest that also carries per-file audio metadata.
+        # It is kept as a SampleTable, safe to share with forked workers
+        if isinstance(list_sample, str) and list_sample.endswith('.npz'):
+            manifest = Manifest(list_sample)
+            if manifest.audio_mode and manifest.audio_mode != self.audio_mode:
+                raise ValueError('{} needs --audio_mode {}, not {}'.format(
+                    list_sample, manifest.audio_mode, self.audio_mode))
+            self.list_sample = manifest.sample_table()
+            self.audio_stats.update(manifest.audio_stats())
+        elif isinstance(list_sample, str):
             # self.list_sample = [x.rstrip() for x in open(list_sample, 'r')]
-            self.list_sample = []
+            rows = []
             for row in csv.reader(open(list_sample, 'r'), delimiter=','):
                 if len(row) < 2:
                     continue
-                self.list_sample.append(row)
+                rows.append(row)
+            self.list_sample = SampleTable.from_rows(rows)
         elif isinstance(list_sample, list):
-            self.list_sample = list_sample
+            self.list_sample = SampleTable.from_rows(list_sample)
         else:
             raise('Error list_sample!')
 
-        if self.split == 'train':
-            self.list_sample *= opt.dup_trainset
-            random.shuffle(self.list_sample)
+        # manifests already carry the stats needed for windowed decoding
+        if self.audio_mode == 'window' and not self.audio_stats:
+            self.audio_stats = load_audio_stats(opt.audio_stats)
 
         if max_sample > 0:
             self.list_sample = self.list_sample[0:max_sample]
@@ -61,15 +155,44 @@ class BaseDataset(torchdata.Dataset):
         assert num_sample > 0
         print('# samples: {}'.format(num_sample))
 
+        # samples failing to load, skipped by every worker
+        # only training reads and writes the quarantine, evaluation
+        # starts from the whole list
+        self.failures = FailureRegistry(
+            self.list_sample, opt.quarantine if split == 'train' else '')
+        # load attempts per video before giving up on an item
+        self.max_resample = 10
+
+        # threads per worker reading the frames and audio of an item
+        self.io_threads = opt.io_threads
+        self._io_pool = None
+        self._io_pid = None
+
     def __len__(self):
         return len(self.list_sample)
 
     # video transform funcs
     def _init_vtransform(self):
+        # short side of the frames after the first Resize
+        if self.split == 'train' or self.frames_device:
+            self.frame_resize = int(self.imgSize * 1.1)
+        else:
+            self.frame_resize = self.imgSize
+
         transform_list = []
         mean = [0.485, 0.456, 0.406]
         std = [0.229, 0.224, 0.225]
 
+        if self.frames_device:
+            # raw uint8 squares, vtransforms.DeviceAugment does the rest
+            transform_list.append(vtransforms.Resize(int(self.imgSize * 1.1), Image.BICUBIC))
+            transform_list.append(vtransforms.SquareCrop(self.split == 'train'))
+            transform_list.append(vtransforms.ToUint8Tensor())
+            transform_list.append(vtransforms.Stack())
+            self.vid_transform = transforms.Compose(transform_list)
+            self.vid_transform_resized = transforms.Compose(transform_list[1:])
+            return
+
         if self.split == 'train':
             transform_list.append(vtransforms.Resize(int(self.imgSize * 1.1), Image.BICUBIC))
             transform_list.append(vtransforms.RandomCrop(self.imgSize))
@@ -82,6 +205,8 @@ class BaseDataset(torchdata.Dataset):
         transform_list.append(vtransforms.Normalize(mean, std))
         transform_list.append(vtransforms.Stack())
         self.vid_transform = transforms.Compose(transform_list)
+        # the same, minus the first Resize, for frames from clip_cache
+        self.vid_transform_resized = transforms.Compose(transform_list[1:])
 
     # image transform funcs, deprecated
     def _init_transform(self):
@@ -102,51 +227,278 @@ class BaseDataset(torchdata.Dataset):
                 transforms.ToTensor(),
                 transforms.Normalize(mean, std)])
 
+    def _crop_window(self, info):
+        """Frame paths and audio center time of one crop of a video,
+        around a center frame (random in training)."""
+        path_audio, path_frame, count_frames = info
+        idx_margin = max(
+            int(self.frameRate * 8), (self.num_frames // 2) * self.stride_frames)
+        if self.split == 'train':
+            # random, not to sample start and end n-frames
+            center_frame = random.randint(
+                idx_margin+1, int(count_frames)-idx_margin)
+        else:
+            center_frame = int(count_frames) // 2
+
+        # absolute frame paths
+        path_frames = []
+        for i in range(self.num_frames):
+            idx_offset = (i - self.num_frames // 2) * self.stride_frames
+            path_frames.append(
+                os.path.join(
+                    path_frame,
+                    '{:06d}.jpg'.format(center_frame + idx_offset)))
+
+        # jitter audio
+        # center_time = (center_frame - random.random()) / self.frameRate
+        center_time = (center_frame - 0.5) / self.frameRate
+        return path_frames, center_time
+
+    def _load_source(self, info):
+        """Frames and audio clip of one video, see _crop_window."""
+        path_frames, center_time = self._crop_window(info)
+        frames = self._load_frames(path_frames)
+        audio = self._load_audio(info[0], center_time)
+        return frames, audio
+
+    def _good_index(self, index):
+        """index, or a random replacement if it is flagged bad."""
+        for _ in range(self.max_resample):
+            if not self.failures.is_bad(index):
+                return index
+            index = self.failures.resample()
+        raise RuntimeError('no unflagged video after {} tries'
+                           .format(self.max_resample))
+
+    def _load_sample(self, index):
+        """(info, frames, audio) of sample index. A sample failing to load
+        is recorded (see FailureRegistry) and replaced by another one."""
+        for _ in range(self.max_resample):
+            index = self._good_index(index)
+            info = self.list_sample[index]
+            try:
+                frames, audio = self._load_source(info)
+                return info, frames, audio
+            except Exception as e:
+                self.failures.record(index, info, e)
+                # tried again when drawn later, not right away
+                index = self.failures.resample()
+        raise RuntimeError('no loadable video after {} tries'
+                           .format(self.max_resample))
+
+    @property
+    def io_pool(self):
+        # made once per process, threads do not survive a fork
+        if self._io_pool is None or self._io_pid != os.getpid():
+            self._io_pool = ThreadPoolExecutor(self.io_threads)
+            self._io_pid = os.getpid()
+        return self._io_pool
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_io_pool'] = None
+        return state
+
+    def _submit_source(self, info):
+        """Futures of the frames and of the audio of one crop of a video.
+
+        Plain JPEGs are read and decoded one task per frame, other frame
+        modes in one task. Random draws (crop window, transforms, volume)
+        stay with the caller, see _gather_source.
+        """
+        path_frames, center_time = self._crop_window(info)
+        if self.frame_store is None and self.frame_packs is None and \
+                self.clip_cache is None:
+            frames = [self.io_pool.submit(self._decode_frames, [path])
+                      for path in path_frames]
+        else:
+            frames = self.io_pool.submit(self._fetch_frames, path_frames)
+        audio = self.io_pool.submit(
+            self._load_audio, info[0], center_time, augment=False)
+        return frames, audio
+
+    def _gather_source(self, frames, audio):
+        if isinstance(frames, list):
+            frames = self.vid_transform(
+                [future.result()[0] for future in frames])
+        else:
+            frames, transform = frames.result()
+            frames = transform(frames)
+        return frames, self._augment_audio(audio.result())
+
+    def _load_samples(self, indices):
+        """_load_sample of several indices. With --io_threads, the frame
+        and audio reads of all of them are issued at once and decoded as
+        they arrive; a failing sample is replaced as in _load_sample."""
+        if not self.io_threads:
+            return [self._load_sample(index) for index in indices]
+
+        jobs = []
+        for index in indices:
+            index = self._good_index(index)
+            info = self.list_sample[index]
+            try:
+                futures = self._submit_source(info)
+            except Exception as e:
+                # e.g. a video too short for the crop window
+                self.failures.record(index, info, e)
+                futures = None
+            jobs.append((index, info, futures))
+        samples = []
+        for index, info, futures in jobs:
+            if futures is not None:
+                try:
+                    frames, audio = self._gather_source(*futures)
+                    samples.append((info, frames, audio))
+                    continue
+                except Exception as e:
+                    self.failures.record(index, info, e)
+            samples.append(self._load_sample(self.failures.resample()))
+        return samples
+
     def _load_frames(self, paths):
-        frames = []
-        for path in paths:
-            frames.append(self._load_frame(path))
-        frames = self.vid_transform(frames)
-        return frames
+        frames, transform = self._fetch_frames(paths)
+        return transform(frames)
+
+    def _fetch_frames(self, paths):
+        """Frames of paths before the random transforms, and the
+        transform still to apply to them."""
+        if self.frame_store is not None:
+            return [Image.fromarray(frame)
+                    for frame in self.frame_store.read(paths)], \
+                self.vid_transform
+        if self.clip_cache is not None:
+            resize = self.vid_transform.transforms[0]
+            keys = ['{}@{}'.format(path, self.frame_resize) for path in paths]
+            cached = [self.clip_cache.get(key) for key in keys]
+            missing = [i for i, frame in enumerate(cached) if frame is None]
+            if missing:
+                decoded = resize(self._decode_frames(
+                    [paths[i] for i in missing]))
+                for i, frame in zip(missing, decoded):
+                    cached[i] = self._to_hwc(frame)
+                    self.clip_cache.put(keys[i], cached[i])
+            return [self._from_hwc(frame) for frame in cached], \
+                self.vid_transform_resized
+        return self._decode_frames(paths), self.vid_transform
+
+    def _decode_frames(self, paths):
+        """Decoded frames of paths, all of one video: PIL Images, or with
+        --frame_decoder torchvision, uint8 C x H x W tensors from one
+        decode_jpeg call."""
+        if self.frame_packs is not None:
+            # a single (coalesced, if remote) read
+            frame_dir = split_frame_path(paths[0])[0]
+            data = self.frame_packs.read_many(
+                frame_dir, [split_frame_path(path)[1] for path in paths])
+        elif self.storage.remote:
+            # concurrent requests for the whole clip
+            data = self.storage.read_many(paths)
+        elif self.frame_decoder == 'pil':
+            return [self._load_frame(path) for path in paths]
+        else:
+            data = [read_file(path) for path in paths]
+        return self._decode_jpegs(data)
+
+    def _decode_jpegs(self, data):
+        """Frames of in-memory JPEGs (bytes or uint8 tensors), as
+        _decode_frames."""
+        if self.frame_decoder == 'pil':
+            return [self._load_frame(io.BytesIO(bytes(jpeg)))
+                    for jpeg in data]
+        data = [jpeg if torch.is_tensor(jpeg) else
+                torch.frombuffer(bytearray(jpeg), dtype=torch.uint8)
+                for jpeg in data]
+        return decode_jpeg(data, mode=ImageReadMode.RGB)
 
     def _load_frame(self, path):
-        img = Image.open(path).convert('RGB')
+        img = Image.open(path)
+        if self.jpeg_draft:
+            # let libjpeg decode at 1/2, 1/4 or 1/8 scale, as long as
+            # both sides still cover the resize target
+            img.draft('RGB', (self.frame_resize, self.frame_resize))
+        img = img.convert('RGB')
         return img
 
+    def _to_hwc(self, frame):
+        # clip_cache holds H x W x C uint8 arrays
+        if torch.is_tensor(frame):
+            return frame.permute(1, 2, 0).numpy()
+        return np.asarray(frame)
+
+    def _from_hwc(self, frame):
+        if self.frame_decoder == 'pil':
+            return Image.fromarray(frame)
+        return torch.from_numpy(frame).permute(2, 0, 1)
+
     def _stft(self, audio):
-        spec = librosa.stft(
-            audio, n_fft=self.stft_frame, hop_length=self.stft_hop)
+        spec = self.stft(audio)
         amp = np.abs(spec)
         phase = np.angle(spec)
         return torch.from_numpy(amp), torch.from_numpy(phase)
 
     def _load_audio_file(self, path):
-        if path.endswith('.mp3'):
-            audio_raw, rate = torchaudio.load(path)
-            # print(f"Initial shape: {audio_raw.shape}")
-            
-            # Convert to numpy
-            audio_raw = audio_raw.numpy().astype(np.float32)
-            
-            # Check and convert stereo to mono if needed
-            if audio_raw.shape[0] == 2:  # Stereo
-                audio_raw = (audio_raw[0] + audio_raw[1]) / 2
-            else:  # Mono
-                audio_raw = audio_raw[0]
-                
-            # print(f"Before normalization range: [{audio_raw.min():.3f}, {audio_raw.max():.3f}]")
-            
-            # Normalize to [-1, 1] range
-            if audio_raw.min() < -1 or audio_raw.max() > 1:
-                audio_raw = audio_raw / max(abs(audio_raw.min()), abs(audio_raw.max()))
-            
-            # print(f"After normalization range: [{audio_raw.min():.3f}, {audio_raw.max():.3f}]")
-            
-            return audio_raw, rate
-        else:
-            return librosa.load(path, sr=None, mono=True)
+        peak = None
+        if path in self.audio_stats:
+            peak = self.audio_stats[path][3]
+        return load_audio_file(path, peak, self.storage)
+
+    def _can_seek(self, path):
+        # tracks shorter than a clip are tiled, which needs the whole file
+        if self.audio_mode != 'window' or path not in self.audio_stats:
+            return False
+        rate, num_samples, _, _ = self.audio_stats[path]
+        return num_samples >= rate * self.audSec
+
+    def _load_audio_window(self, path, center_timestamp, quality):
+        """Decode only the source samples around center_timestamp.
+
+        Returns the window at output rate, the output index of its first
+        sample and the length the fully decoded track would have, so the
+        crop matches the full-decode path.
+        """
+        rate, num_samples, _, peak = self.audio_stats[path]
+        resample = rate > self.audRate
+        len_raw = num_samples
+        if resample:
+            len_raw = self.resampler.output_length(
+                num_samples, rate, self.audRate, quality)
+
+        center = int(center_timestamp * self.audRate)
+        start = max(0, center - self.audLen // 2)
+        end = min(len_raw, center + self.audLen // 2)
 
-    def _load_audio(self, path, center_timestamp, nearest_resample=False):
+        # source samples under the window, plus the filter's reach
+        src_start, src_end = start, end
+        if resample:
+            src_start, src_end = self.resampler.input_range(
+                rate, self.audRate, start, end, quality)
+        src_start, src_end = max(0, src_start), min(num_samples, src_end)
+        # with --storage the whole object is still fetched (or read from
+        # --storage_cache), only decoding is saved
+        audio_raw, _ = torchaudio.load(
+            self.storage.open(path), frame_offset=src_start,
+            num_frames=src_end - src_start)
+        audio_raw = audio_raw.numpy().astype(np.float32)
+        if audio_raw.shape[0] == 2:
+            audio_raw = (audio_raw[0] + audio_raw[1]) / 2
+        else:
+            audio_raw = audio_raw[0]
+
+        # normalize with the whole-file peak, not the window's
+        if path.endswith('.mp3') and peak > 1:
+            audio_raw = audio_raw / peak
+
+        if not resample:
+            return audio_raw, src_start, len_raw
+        audio_raw = self.resampler(audio_raw, rate, self.audRate, start, end,
+                                   offset=src_start, quality=quality)
+        return audio_raw, start, len_raw
+
+    def _load_audio(self, path, center_timestamp, nearest_resample=False,
+                    augment=True):
+        # augment=False: without the random volume of training, as cut
+        # into shards by scripts/create_shards.py
         audio = np.zeros(self.audLen, dtype=np.float32)
 
         # silent
@@ -154,30 +506,65 @@ class BaseDataset(torchdata.Dataset):
             return audio
 
         # load audio
-        audio_raw, rate = self._load_audio_file(path)
-
-        # repeat if audio is too short
-        if audio_raw.shape[0] < rate * self.audSec:
-            n = int(rate * self.audSec / audio_raw.shape[0]) + 1
-            audio_raw = np.tile(audio_raw, n)
-
-        # resample
-        if rate > self.audRate:
-            # print('resmaple {}->{}'.format(rate, self.audRate))
-            if nearest_resample:
-                audio_raw = audio_raw[::rate//self.audRate]
-            else:
-                audio_raw = librosa.resample(audio_raw, rate, self.audRate)
+        offset = 0
+        resample_rate = None
+        quality = 'nearest' if nearest_resample else self.resample_quality
+        if self._can_seek(path):
+            audio_raw, offset, len_raw = self._load_audio_window(
+                path, center_timestamp, quality)
+        else:
+            key = '{}@{}{}'.format(path, self.audRate, quality)
+            audio_raw = None
+            if self.audio_store is not None:
+                # already mono at audRate, memory-mapped
+                audio_raw, rate = self.audio_store.load(path), self.audRate
+            elif self.clip_cache is not None:
+                # decoded, tiled and resampled by another worker
+                audio_raw, rate = self.clip_cache.get(key), self.audRate
+            decoded = audio_raw is None
+            if decoded:
+                audio_raw, rate = self._load_audio_file(path)
+
+            # repeat if audio is too short
+            if audio_raw.shape[0] < rate * self.audSec:
+                n = int(rate * self.audSec / audio_raw.shape[0]) + 1
+                audio_raw = np.tile(audio_raw, n)
+
+            # resample, the whole track if it goes to the cache, else
+            # only the crop window below
+            len_raw = audio_raw.shape[0]
+            if rate > self.audRate:
+                if self.clip_cache is not None:
+                    audio_raw = self.resampler(
+                        audio_raw, rate, self.audRate, quality=quality)
+                    len_raw = audio_raw.shape[0]
+                else:
+                    resample_rate = rate
+                    len_raw = self.resampler.output_length(
+                        len_raw, rate, self.audRate, quality)
+            if decoded and self.clip_cache is not None and rate >= self.audRate:
+                self.clip_cache.put(key, audio_raw)
 
         # crop N seconds
-        len_raw = audio_raw.shape[0]
         center = int(center_timestamp * self.audRate)
         start = max(0, center - self.audLen // 2)
         end = min(len_raw, center + self.audLen // 2)
 
+        if resample_rate is not None:
+            window = self.resampler(audio_raw, resample_rate, self.audRate,
+                                    start, end, quality=quality)
+        else:
+            window = audio_raw[start-offset:end-offset]
+        if window.dtype == np.int16:
+            window = window / 32768.
         audio[self.audLen//2-(center-start): self.audLen//2+(end-center)] = \
-            audio_raw[start:end]
+            window
 
+        if augment:
+            audio = self._augment_audio(audio)
+        return audio
+
+    def _augment_audio(self, audio):
         # randomize volume
         if self.split == 'train':
             scale = random.random() + 0.5     # 0.5-1.5
@@ -187,27 +574,37 @@ class BaseDataset(torchdata.Dataset):
 
         return audio
 
-    def _mix_n_and_stft(self, audios):
+    def _mix_n(self, audios):
+        N = len(audios)
+        for n in range(N):
+            audios[n] = torch.from_numpy(audios[n] / N)
+        return audios
+
+    def _mix_n_and_stft(self, audios, phase=True):
         N = len(audios)
-        mags = [None for n in range(N)]
 
         # mix
         for n in range(N):
             audios[n] /= N
-        audio_mix = np.asarray(audios).sum(axis=0)
 
-        # STFT
-        amp_mix, phase_mix = self._stft(audio_mix)
-        for n in range(N):
-            ampN, _ = self._stft(audios[n])
-            mags[n] = ampN.unsqueeze(0)
+        # STFT of all sources in one batch; STFT is linear, so the
+        # mixture spectrum is the sum of the source spectra
+        specs = self.stft(np.stack(audios))
+        spec_mix = specs.sum(axis=0)
+        amp_mix = torch.from_numpy(np.abs(spec_mix))
+        mags = [torch.from_numpy(np.abs(specs[n])).unsqueeze(0)
+                for n in range(N)]
+        # phase is only needed to reconstruct waveforms
+        phase_mix = None
+        if phase:
+            phase_mix = torch.from_numpy(np.angle(spec_mix)).unsqueeze(0)
 
         # to tensor
         # audio_mix = torch.from_numpy(audio_mix)
         for n in range(N):
             audios[n] = torch.from_numpy(audios[n])
 
-        return amp_mix.unsqueeze(0), mags, phase_mix.unsqueeze(0)
+        return amp_mix.unsqueeze(0), mags, phase_mix
 
     def dummy_mix_data(self, N):
         frames = [None for n in range(N)]
@@ -218,8 +615,13 @@ class BaseDataset(torchdata.Dataset):
         phase_mix = torch.zeros(1, self.HS, self.WS)
 
         for n in range(N):
-            frames[n] = torch.zeros(
-                3, self.num_frames, self.imgSize, self.imgSize)
+            if self.frames_device:
+                size = int(self.imgSize * 1.1)
+                frames[n] = torch.zeros(
+                    3, self.num_frames, size, size, dtype=torch.uint8)
+            else:
+                frames[n] = torch.zeros(
+                    3, self.num_frames, self.imgSize, self.imgSize)
             audios[n] = torch.zeros(self.audLen)
             mags[n] = torch.zeros(1, self.HS, self.WS)
 
@@ -0,0 +1,218 @@
+import os
+import atexit
+import hashlib
+import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+DTYPES = [np.float32, np.uint8, np.int16, np.float64]
+# per-entry fields of the index: key hash (0: free slot), last use,
+# nbytes, dtype code, ndim and up to 3 dims
+FIELDS = 8
+# shared counters: clock, used bytes, hits, misses, evictions, entries
+CLOCK, USED, HITS, MISSES, EVICTIONS, COUNT = range(6)
+# occupied slots sampled to pick an entry to evict
+EVICT_SAMPLE = 64
+
+
+def open_segment(name, create=False, size=0):
+    """Shared memory segment left out of the resource tracker, whose
+    cleanup at a worker's exit would drop entries still in use."""
+    try:
+        return shared_memory.SharedMemory(
+            name=name, create=create, size=size, track=False)
+    except TypeError:
+        # python < 3.13
+        shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class SharedClipCache(object):
+    """Bounded LRU cache of decoded arrays, shared by DataLoader workers.
+
+    Every entry is its own shared memory segment, named after the key
+    hash. The index (key hashes, last use, shapes) and the hit/miss
+    counters live in a RawArray behind one Lock, so a clip decoded by one
+    worker is reused by all the others. The index is a hash table of
+    2 * max_entries slots with linear probing, a lookup touches a few
+    slots. Eviction is approximate LRU: the least recently used of
+    EVICT_SAMPLE random slots. Segments are released by eviction or by
+    the process that created the cache, at exit.
+    """
+    def __init__(self, capacity, max_entries=None):
+        self.capacity = capacity
+        if max_entries is None:
+            max_entries = max(1024, capacity // (64 << 10))
+        self.max_entries = max_entries
+        # at most half full, keeps probe sequences short
+        self.num_slots = 2 * max_entries
+        self.prefix = 'sopc{}_{}_'.format(os.getpid(), os.urandom(3).hex())
+        self.lock = mp.Lock()
+        self.index = mp.RawArray('q', self.num_slots * FIELDS)
+        self.counters = mp.RawArray('q', 6)
+        self._table = None
+        self._rng = None
+
+        self.owner = os.getpid()
+        atexit.register(self.close)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_table'] = None
+        state['_rng'] = None
+        return state
+
+    @property
+    def table(self):
+        # numpy view of the shared index, made once per process
+        if self._table is None:
+            self._table = np.frombuffer(self.index, dtype=np.int64) \
+                .reshape(self.num_slots, FIELDS)
+        return self._table
+
+    @property
+    def rng(self):
+        # per process, leaves the global numpy state alone
+        if self._rng is None:
+            self._rng = np.random.default_rng()
+        return self._rng
+
+    def _hash(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'little', signed=True) or 1
+
+    def _name(self, h):
+        return self.prefix + format(h & (2 ** 64 - 1), 'x')
+
+    def _find(self, h):
+        """Slot of hash h, or the free slot ending its probe sequence."""
+        table = self.table
+        slot = h % self.num_slots
+        while table[slot, 0] != 0 and table[slot, 0] != h:
+            slot = (slot + 1) % self.num_slots
+        return slot
+
+    def _remove(self, slot):
+        """Free slot, shifting back later entries of the same run so
+        that no probe sequence is cut short (no tombstones)."""
+        table, n = self.table, self.num_slots
+        table[slot] = 0
+        i = slot
+        while True:
+            i = (i + 1) % n
+            h = table[i, 0]
+            if h == 0:
+                return
+            home = h % n
+            # the entry stays if its home is cyclically in (slot, i]
+            if (slot < home <= i) if slot <= i else (home > slot or home <= i):
+                continue
+            table[slot] = table[i]
+            table[i] = 0
+            slot = i
+
+    def _victim(self):
+        """Least recently used of a random sample of occupied slots."""
+        table = self.table
+        slots = self.rng.integers(0, self.num_slots, EVICT_SAMPLE)
+        slots = slots[table[slots, 0] != 0]
+        if len(slots) == 0:
+            # a sparse table, only holding large entries
+            slots = np.flatnonzero(table[:, 0] != 0)
+        return slots[np.argmin(table[slots, 1])]
+
+    def get(self, key):
+        """The cached array of key, or None."""
+        h = self._hash(key)
+        with self.lock:
+            entry = self.table[self._find(h)]
+            if entry[0] == 0:
+                self.counters[MISSES] += 1
+                return None
+            self.counters[CLOCK] += 1
+            entry[1] = self.counters[CLOCK]
+            self.counters[HITS] += 1
+            dtype, shape = DTYPES[entry[3]], tuple(entry[5:5 + entry[4]])
+
+        try:
+            shm = open_segment(self._name(h))
+        except FileNotFoundError:
+            # evicted in the meantime
+            return None
+        array = np.ndarray(shape, dtype, buffer=shm.buf).copy()
+        shm.close()
+        return array
+
+    def put(self, key, array):
+        array = np.ascontiguousarray(array)
+        nbytes = array.nbytes
+        if nbytes == 0 or nbytes > self.capacity or array.ndim > 3 or \
+                array.dtype not in DTYPES:
+            return
+        # a full /dev/shm would SIGBUS on write rather than fail
+        stat = os.statvfs('/dev/shm')
+        if stat.f_bavail * stat.f_frsize < 2 * nbytes:
+            return
+
+        h = self._hash(key)
+        try:
+            shm = open_segment(self._name(h), create=True, size=nbytes)
+        except FileExistsError:
+            # another worker is caching the same clip
+            return
+        np.ndarray(array.shape, array.dtype, buffer=shm.buf)[...] = array
+        shm.close()
+
+        evicted = []
+        with self.lock:
+            table, counters = self.table, self.counters
+            while counters[COUNT] > 0 and (
+                    counters[USED] + nbytes > self.capacity or
+                    counters[COUNT] >= self.max_entries):
+                slot = self._victim()
+                evicted.append(int(table[slot, 0]))
+                counters[USED] -= table[slot, 2]
+                counters[COUNT] -= 1
+                counters[EVICTIONS] += 1
+                self._remove(slot)
+            slot = self._find(h)
+            counters[CLOCK] += 1
+            table[slot, :5] = [h, counters[CLOCK], nbytes,
+                               DTYPES.index(array.dtype.type), array.ndim]
+            table[slot, 5:5 + array.ndim] = array.shape
+            counters[USED] += nbytes
+            counters[COUNT] += 1
+        for h in evicted:
+            self._unlink(h)
+
+    def _unlink(self, h):
+        try:
+            # tracked, unlink() then unregisters it
+            shm = shared_memory.SharedMemory(name=self._name(h))
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+    def summary(self):
+        counters = list(self.counters)
+        lookups = max(1, counters[HITS] + counters[MISSES])
+        return {'entries': counters[COUNT],
+                'MB': counters[USED] >> 20,
+                'hits': counters[HITS], 'misses': counters[MISSES],
+                'hit_rate': round(counters[HITS] / lookups, 3),
+                'evictions': counters[EVICTIONS]}
+
+    def close(self):
+        """Release every segment, only done by the creating process."""
+        if os.getpid() != self.owner:
+            return
+        with self.lock:
+            hashes = self.table[self.table[:, 0] != 0, 0].tolist()
+            self.table[:] = 0
+            self.counters[USED] = 0
+            self.counters[COUNT] = 0
+        for h in hashes:
+            self._unlink(h)
@@ -0,0 +1,51 @@
+import torch
+import torch.utils.data as torchdata
+
+# per-source lists of MUSICMixDataset items
+SOURCE_KEYS = ('frames', 'mags', 'audios')
+
+
+def sources(x):
+    """The N per-source B x ... tensors of a batch field, as views when
+    it was stacked by stack_collate."""
+    return list(x.unbind(1)) if torch.is_tensor(x) else x
+
+
+def empty_like_batch(elem, shape, pin_memory=False):
+    if torchdata.get_worker_info() is not None:
+        # in a worker: straight into shared memory, as default_collate
+        # does, so sending the batch to the main process is not a copy
+        storage = elem._typed_storage()._new_shared(
+            int(torch.Size(shape).numel()), device=elem.device)
+        return elem.new(storage).resize_(shape)
+    return torch.empty(shape, dtype=elem.dtype, device=elem.device,
+                       pin_memory=pin_memory)
+
+
+def stack_collate(batch, pin_memory=False):
+    """default_collate, except that the N-tensor lists of SOURCE_KEYS
+    become single B x N x ... tensors, filled in place in one buffer.
+
+    pin_memory only applies without workers (from workers, pinning is
+    done by DataLoader(pin_memory=True)).
+    """
+    stacked = {}
+    for key in SOURCE_KEYS:
+        if key not in batch[0] or not isinstance(batch[0][key], list):
+            continue
+        elem = batch[0][key][0]
+        shape = (len(batch), len(batch[0][key])) + tuple(elem.shape)
+        out = empty_like_batch(elem, shape, pin_memory)
+        for j, item in enumerate(batch):
+            for n, tensor in enumerate(item[key]):
+                out[j, n].copy_(tensor)
+        stacked[key] = out
+
+    rest = [{k: v for k, v in item.items() if k not in stacked}
+            for item in batch]
+    batch_data = torchdata.default_collate(rest)
+    if pin_memory and torchdata.get_worker_info() is None:
+        batch_data = {k: v.pin_memory() if torch.is_tensor(v) else v
+                      for k, v in batch_data.items()}
+    batch_data.update(stacked)
+    return batch_data
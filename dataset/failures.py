@@ -0,0 +1,71 @@
+import os
+import random
+import multiprocessing as mp
+
+
+class FailureRegistry(object):
+    """Samples that failed to load, shared by all DataLoader workers.
+
+    Flags and counters live in shared memory, so a sample flagged in one
+    worker is skipped by all of them. A sample is flagged after
+    max_failures failed loads, a single (maybe transient) failure only
+    replaces the item at hand. Flagged samples are appended to a
+    quarantine csv (audio,frames,error), skipped from the start by later
+    runs.
+    """
+    def __init__(self, list_sample, quarantine='', max_failures=2):
+        self.quarantine = quarantine
+        self.max_failures = max_failures
+        self.num_samples = len(list_sample)
+        self.bad = mp.Array('b', self.num_samples)
+        self.failures = mp.Array('i', self.num_samples)
+        self.num_bad = mp.Value('i', 0)
+        self.num_errors = mp.Value('i', 0)
+        self.num_resampled = mp.Value('i', 0)
+
+        if quarantine and os.path.exists(quarantine):
+            bad_pairs = set()
+            with open(quarantine, 'r') as f:
+                for line in f:
+                    bad_pairs.add(tuple(line.rstrip('\n').split(',')[:2]))
+            for i in range(self.num_samples):
+                if tuple(list_sample[i][:2]) in bad_pairs:
+                    self.bad[i] = 1
+                    self.num_bad.value += 1
+            print('{} samples quarantined by {}'.format(
+                self.num_bad.value, quarantine))
+
+    def is_bad(self, i):
+        return self.bad[i] != 0
+
+    def record(self, i, info, error):
+        """Count a failed load of sample i, whose row is info, and flag it
+        at max_failures."""
+        with self.num_errors.get_lock():
+            self.num_errors.value += 1
+        print('Failed loading {}: {}'.format(info[1], error))
+        with self.bad.get_lock():
+            self.failures[i] += 1
+            if self.bad[i] or self.failures[i] < self.max_failures:
+                return
+            self.bad[i] = 1
+            self.num_bad.value += 1
+        if self.quarantine:
+            # a single short append, safe from concurrent workers
+            message = str(error).replace('\n', ' ').replace(',', ';')
+            with open(self.quarantine, 'a') as f:
+                f.write('{},{},{}\n'.format(info[0], info[1], message))
+
+    def resample(self, max_tries=100):
+        """A random index not flagged as bad."""
+        with self.num_resampled.get_lock():
+            self.num_resampled.value += 1
+        for _ in range(max_tries):
+            i = random.randint(0, self.num_samples - 1)
+            if not self.bad[i]:
+                return i
+        raise RuntimeError('No loadable sample found')
+
+    def summary(self):
+        return {'bad': self.num_bad.value, 'errors': self.num_errors.value,
+                'resampled': self.num_resampled.value}
@@ -0,0 +1,99 @@
+import os
+import struct
+import numpy as np
+
+from .open_files import OpenFiles
+
+# file layout: magic, uint64 frame count, uint64 offsets[count + 1],
+# then the JPEG bytes of all frames back to back
+MAGIC = b'SOPPACK1'
+HEADER = struct.Struct('<8sQ')
+
+
+def pack_path(frame_dir):
+    return os.path.normpath(frame_dir) + '.pack'
+
+
+def write_pack(filename, jpeg_paths):
+    """Concatenate JPEG files (in frame order) into one pack file."""
+    sizes = [os.path.getsize(path) for path in jpeg_paths]
+    offsets = np.zeros(len(sizes) + 1, dtype='<u8')
+    offsets[0] = HEADER.size + offsets.nbytes
+    offsets[1:] = offsets[0] + np.cumsum(sizes, dtype=np.uint64)
+
+    tmp = filename + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(sizes)))
+        f.write(offsets.tobytes())
+        for path in jpeg_paths:
+            with open(path, 'rb') as jpeg:
+                f.write(jpeg.read())
+    os.replace(tmp, filename)
+    return filename
+
+
+class FramePack(object):
+    """Random access to the frames of one pack, one pread per frame, or
+    ranged reads through a remote storage (dataset/storage.py)."""
+    def __init__(self, filename, storage=None):
+        self.filename = filename
+        self.storage = storage
+        self.fd = None
+        if storage is None:
+            self.fd = os.open(filename, os.O_RDONLY)
+        magic, count = HEADER.unpack(self._read(0, HEADER.size))
+        if magic != MAGIC:
+            self.close()
+            raise IOError('Not a frame pack: {}'.format(filename))
+        self.offsets = np.frombuffer(
+            self._read(HEADER.size, HEADER.size + 8 * (count + 1)), dtype='<u8')
+
+    def _read(self, start, end):
+        if self.fd is not None:
+            return os.pread(self.fd, end - start, start)
+        return self.storage.read_ranges(self.filename, [(start, end)])[0]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _range(self, i):
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def read(self, i):
+        """JPEG bytes of frame i (0-based)."""
+        return self._read(*self._range(i))
+
+    def read_many(self, indices):
+        """JPEG bytes of several frames, remote reads coalesced."""
+        if self.fd is not None:
+            return [self.read(i) for i in indices]
+        return self.storage.read_ranges(
+            self.filename, [self._range(i) for i in indices])
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __del__(self):
+        self.close()
+
+
+class FramePackReader(object):
+    """Keeps the max_open most recently used packs open, reopened lazily
+    in each worker."""
+    def __init__(self, storage=None, max_open=256):
+        self.storage = storage
+        self.packs = OpenFiles(max_open)
+
+    def _open(self, frame_dir):
+        return FramePack(pack_path(frame_dir), self.storage)
+
+    def pack(self, frame_dir):
+        return self.packs.get(frame_dir, self._open)
+
+    def read(self, frame_dir, i):
+        return self.pack(frame_dir).read(i)
+
+    def read_many(self, frame_dir, indices):
+        return self.pack(frame_dir).read_many(indices)
@@ -0,0 +1,91 @@
+import os
+import numpy as np
+
+from .audio_store import store_path
+from .open_files import OpenFiles
+
+# videos also kept for evaluation, at its final size (imgSize), so that the
+# validation resize is a no-op like on the JPEGs
+VAL_EXT = '.val.npy'
+
+
+def split_frame_path(path):
+    """'<frame_dir>/000123.jpg' -> ('<frame_dir>', 122), 0-based index."""
+    frame_dir, filename = os.path.split(path)
+    return frame_dir, int(os.path.splitext(filename)[0]) - 1
+
+
+def write_video(root, frame_dir, num_frames, frames, ext='.npy'):
+    """Save the frames of one video, an iterable of HxWx3 uint8 arrays.
+
+    Frames are streamed into the output map, so a whole video never
+    has to fit in memory.
+    """
+    filename = store_path(root, frame_dir, ext)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmp = filename + '.tmp.npy'
+    out = None
+    for i, frame in enumerate(frames):
+        if out is None:
+            out = np.lib.format.open_memmap(
+                tmp, mode='w+', dtype=np.uint8,
+                shape=(num_frames,) + frame.shape)
+        out[i] = frame
+    out.flush()
+    del out
+    os.replace(tmp, filename)
+    return filename
+
+
+def write_raw_video(root, frame_dir, raw_filename, height, width,
+                    ext='.npy'):
+    """Save a video from a file of packed rgb24 frames (e.g. ffmpeg
+    -f rawvideo output), without holding it in memory.
+
+    Returns the number of frames.
+    """
+    frame_bytes = height * width * 3
+    num_frames = os.path.getsize(raw_filename) // frame_bytes
+    filename = store_path(root, frame_dir, ext)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmp = filename + '.tmp.npy'
+    header = {'descr': np.lib.format.dtype_to_descr(np.dtype(np.uint8)),
+              'fortran_order': False,
+              'shape': (num_frames, height, width, 3)}
+    with open(tmp, 'wb') as f, open(raw_filename, 'rb') as raw:
+        np.lib.format.write_array_header_1_0(f, header)
+        remaining = num_frames * frame_bytes
+        while remaining > 0:
+            chunk = raw.read(min(remaining, 1 << 24))
+            f.write(chunk)
+            remaining -= len(chunk)
+    os.replace(tmp, filename)
+    return num_frames
+
+
+class FrameStore(object):
+    """Frames pre-resized to training resolution, one memory-mapped
+    NxHxWx3 uint8 .npy per video.
+
+    Reading a clip is a single fancy-index slice per video instead of
+    num_frames JPEG opens, decodes and resizes. The max_open most
+    recently used maps are kept open, per process. ext selects the
+    training (.npy) or the evaluation (VAL_EXT) frames.
+    """
+    def __init__(self, root, max_open=256, ext='.npy'):
+        self.root = root
+        self.ext = ext
+        self.videos = OpenFiles(max_open)
+
+    def _open(self, frame_dir):
+        return np.load(store_path(self.root, frame_dir, self.ext),
+                       mmap_mode='r')
+
+    def load(self, frame_dir):
+        return self.videos.get(frame_dir, self._open)
+
+    def read(self, paths):
+        """Frames for a list of '<frame_dir>/%06d.jpg' paths of one video."""
+        frame_dir, _ = split_frame_path(paths[0])
+        idx = [split_frame_path(path)[1] for path in paths]
+        return self.load(frame_dir)[idx]
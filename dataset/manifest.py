@@ -0,0 +1,121 @@
+import numpy as np
+
+# per-video columns of a manifest, besides the two path ids
+COLUMNS = [('count_frames', np.int32), ('audio_rate', np.int32),
+           ('num_samples', np.int64), ('num_channels', np.int16),
+           ('peak', np.float32)]
+
+
+class StringTable(object):
+    """Interned strings, stored as one utf-8 buffer plus offsets."""
+    def __init__(self, buffer, offsets):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        ids = {}
+        for string in strings:
+            ids.setdefault(string, len(ids))
+        encoded = [string.encode('utf-8') for string in ids]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+        buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(buffer, offsets), ids
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.buffer[self.offsets[i]:self.offsets[i + 1]] \
+            .tobytes().decode('utf-8')
+
+
+def write_manifest(filename, rows, audio_mode=''):
+    """Save rows of (audio_path, frame_path, count_frames, audio_rate,
+    num_samples, num_channels, peak) as a columnar .npz.
+
+    Unknown audio metadata is stored as 0. A non-empty audio_mode is the
+    only --audio_mode the manifest can be trained with, e.g. 'store' when
+    its audio paths are only keys into an audio store.
+    """
+    table, ids = StringTable.from_strings(
+        [path for row in rows for path in row[:2]])
+    arrays = {'strings': table.buffer, 'string_offsets': table.offsets,
+              'audio': np.array([ids[row[0]] for row in rows], np.int32),
+              'frame': np.array([ids[row[1]] for row in rows], np.int32)}
+    for i, (name, dtype) in enumerate(COLUMNS):
+        arrays[name] = np.array([row[2 + i] for row in rows], dtype)
+    if audio_mode:
+        arrays['audio_mode'] = np.array(audio_mode)
+    with open(filename, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+class SampleTable(object):
+    """Read-only [audio, frames, count] rows, as int arrays into a
+    StringTable.
+
+    Unlike a list of lists of str, indexing it only reads numpy buffers,
+    so forked workers never write to (and copy) the parent's pages.
+    """
+    def __init__(self, strings, audio, frame, count_frames):
+        self.strings = strings
+        self.audio = audio
+        self.frame = frame
+        self.count_frames = count_frames
+
+    @classmethod
+    def from_rows(cls, rows):
+        strings, ids = StringTable.from_strings(
+            [path for row in rows for path in row[:2]])
+        return cls(strings,
+                   np.array([ids[row[0]] for row in rows], np.int32),
+                   np.array([ids[row[1]] for row in rows], np.int32),
+                   np.array([int(row[2]) for row in rows], np.int32))
+
+    def __len__(self):
+        return len(self.audio)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return SampleTable(self.strings, self.audio[i], self.frame[i],
+                               self.count_frames[i])
+        return [self.strings[self.audio[i]], self.strings[self.frame[i]],
+                str(self.count_frames[i])]
+
+
+class Manifest(object):
+    """Index of a dataset split, loaded without parsing any text."""
+    def __init__(self, filename):
+        with np.load(filename, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+        self.strings = StringTable(
+            arrays.pop('strings'), arrays.pop('string_offsets'))
+        self.audio_mode = str(arrays.pop('audio_mode', ''))
+        for key, value in arrays.items():
+            setattr(self, key, value)
+
+    def __len__(self):
+        return len(self.audio)
+
+    def row(self, i):
+        """Same row as in the csv index: [audio, frames, count]."""
+        return [self.strings[self.audio[i]], self.strings[self.frame[i]],
+                str(self.count_frames[i])]
+
+    def rows(self):
+        return [self.row(i) for i in range(len(self))]
+
+    def sample_table(self):
+        return SampleTable(self.strings, self.audio, self.frame,
+                           self.count_frames)
+
+    def audio_stats(self):
+        """{audio_path: (rate, num_samples, num_channels, peak)}."""
+        stats = {}
+        for i in np.flatnonzero(self.audio_rate > 0):
+            stats[self.strings[self.audio[i]]] = (
+                int(self.audio_rate[i]), int(self.num_samples[i]),
+                int(self.num_channels[i]), float(self.peak[i]))
+        return stats
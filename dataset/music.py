@@ -1,4 +1,3 @@
-import os
 import random
 from .base import BaseDataset
 
@@ -15,52 +14,16 @@ class MUSICMixDataset(BaseDataset):
         frames = [None for n in range(N)]
         audios = [None for n in range(N)]
         infos = [[] for n in range(N)]
-        path_frames = [[] for n in range(N)]
-        path_audios = ['' for n in range(N)]
-        center_frames = [0 for n in range(N)]
 
-        # the first video
-        infos[0] = self.list_sample[index]
-
-        # sample other videos
+        # the first video is index, other videos are sampled
         if not self.split == 'train':
             random.seed(index)
-        for n in range(1, N):
-            indexN = random.randint(0, len(self.list_sample)-1)
-            infos[n] = self.list_sample[indexN]
-
-        # select frames
-        idx_margin = max(
-            int(self.fps * 8), (self.num_frames // 2) * self.stride_frames)
-        for n, infoN in enumerate(infos):
-            path_audioN, path_frameN, count_framesN = infoN
-
-            if self.split == 'train':
-                # random, not to sample start and end n-frames
-                center_frameN = random.randint(
-                    idx_margin+1, int(count_framesN)-idx_margin)
-            else:
-                center_frameN = int(count_framesN) // 2
-            center_frames[n] = center_frameN
-
-            # absolute frame/audio paths
-            for i in range(self.num_frames):
-                idx_offset = (i - self.num_frames // 2) * self.stride_frames
-                path_frames[n].append(
-                    os.path.join(
-                        path_frameN,
-                        '{:06d}.jpg'.format(center_frameN + idx_offset)))
-            path_audios[n] = path_audioN
-
-        # load frames and audios, STFT
         try:
-            for n, infoN in enumerate(infos):
-                frames[n] = self._load_frames(path_frames[n])
-                # jitter audio
-                # center_timeN = (center_frames[n] - random.random()) / self.fps
-                center_timeN = (center_frames[n] - 0.5) / self.fps
-                audios[n] = self._load_audio(path_audios[n], center_timeN)
-            mag_mix, mags, phase_mix = self._mix_n_and_stft(audios)
+            indices = [index] + [random.randint(0, len(self.list_sample)-1)
+                                 for n in range(1, N)]
+            for n, sample in enumerate(self._load_samples(indices)):
+                infos[n], frames[n], audios[n] = sample
+            mag_mix, mags, phase_mix = self._mix(audios)
 
         except Exception as e:
             print('Failed loading frame/audio: {}'.format(e))
@@ -68,6 +31,22 @@ class MUSICMixDataset(BaseDataset):
             mag_mix, mags, frames, audios, phase_mix = \
                 self.dummy_mix_data(N)
 
+        return self._item(infos, frames, audios, mag_mix, mags, phase_mix)
+
+    def _mix(self, audios):
+        if self.stft_device:
+            # spectrograms are computed by NetWrapper on the device
+            self._mix_n(audios)
+            return None, None, None
+        return self._mix_n_and_stft(audios, phase=self.split != 'train')
+
+    def _item(self, infos, frames, audios, mag_mix, mags, phase_mix):
+        if self.stft_device:
+            ret_dict = {'frames': frames, 'audios': audios}
+            if self.split != 'train':
+                ret_dict['infos'] = infos
+            return ret_dict
+
         ret_dict = {'mag_mix': mag_mix, 'frames': frames, 'mags': mags}
         if self.split != 'train':
             ret_dict['audios'] = audios
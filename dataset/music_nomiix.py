@@ -1,50 +1,53 @@
-import os
 import random
+import torch
 from .base import BaseDataset
 
+
 class MUSICNoMixDataset(BaseDataset):
+    """Single-source clips (frames and waveform, no STFT). Mixtures are
+    built on the training device by mix_in_batch, so every decoded clip
+    can take part in several mixtures.
+    """
     def __init__(self, list_sample, opt, **kwargs):
         super(MUSICNoMixDataset, self).__init__(list_sample, opt, **kwargs)
         self.fps = opt.frameRate
 
     def __getitem__(self, index):
-        # Info to retrieve individual audio and frames
-        infos = self.list_sample[index]
-
-        # Load frame and audio info
-        path_audio, path_frame, count_frames = infos
-
-        # Select center frame (either randomly for training or middle frame for validation/test)
-        idx_margin = max(int(self.fps * 8), (self.num_frames // 2) * self.stride_frames)
-        if self.split == 'train':
-            center_frame = random.randint(idx_margin + 1, int(count_frames) - idx_margin)
-        else:
-            center_frame = int(count_frames) // 2
-
-        # Absolute frame paths
-        path_frames = []
-        for i in range(self.num_frames):
-            idx_offset = (i - self.num_frames // 2) * self.stride_frames
-            path_frames.append(
-                os.path.join(path_frame, '{:06d}.jpg'.format(center_frame + idx_offset)))
-
-        # Load frames and audio
+        if not self.split == 'train':
+            random.seed(index)
         try:
-            frames = self._load_frames(path_frames)
-            center_time = (center_frame - 0.5) / self.fps  # Optional jitter or fixed center
-            audio = self._load_audio(path_audio, center_time)
-            mag, _ = self._stft(audio)
-            mag = mag.unsqueeze(0)
-
+            infos, frames, audio = self._load_samples([index])[0]
+            audio = torch.from_numpy(audio)
         except Exception as e:
-            print(f"Failed loading frame/audio: {e}")
-            # Handle error, create dummy data
-            frames, audio = self.dummy_frame_audio_data()
+            print('Failed loading frame/audio: {}'.format(e))
+            # create dummy data
+            infos = self.list_sample[index]
+            _, _, frames, audios, _ = self.dummy_mix_data(1)
+            frames, audio = frames[0], audios[0]
 
-        # Return dictionary with frame and audio data
-        ret_dict = {'frames': frames, 'audio': audio, 'mags':mag}
-        
+        ret_dict = {'frames': frames, 'audio': audio}
         if self.split != 'train':
-            ret_dict['infos'] = infos  # Metadata if not training
-
+            ret_dict['infos'] = infos
         return ret_dict
+
+
+def mix_in_batch(batch_data, num_mix, num_pairings=1):
+    """Turn a batch of B single-source clips into B*num_pairings mixtures
+    of num_mix sources, in the MUSICMixDataset (--stft_device) layout.
+
+    Each pairing shuffles the batch and pairs it with num_mix-1 distinct
+    nonzero cyclic shifts of itself, so no mixture holds a clip twice.
+    Waveforms are scaled by 1/num_mix, as in BaseDataset._mix_n.
+    """
+    audio, frames = batch_data['audio'], batch_data['frames']
+    B = audio.size(0)
+    assert B >= num_mix, 'mix_in_batch needs at least num_mix clips'
+    index = [[] for n in range(num_mix)]
+    for _ in range(num_pairings):
+        perm = torch.randperm(B)
+        shifts = [0] + (torch.randperm(B - 1)[:num_mix - 1] + 1).tolist()
+        for n in range(num_mix):
+            index[n].append(perm.roll(-shifts[n]))
+    index = [torch.cat(index_n).to(audio.device) for index_n in index]
+    return {'audios': [audio[index_n] / num_mix for index_n in index],
+            'frames': [frames[index_n] for index_n in index]}
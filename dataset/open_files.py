@@ -0,0 +1,49 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class OpenFiles(object):
+    """The max_open most recently used open files (packs, memory maps)
+    of a store, by key, shared by the threads of a process.
+
+    Evicted files are only dropped from here: a FramePack or a map
+    closes once no reader holds it any more, so a thread still reading
+    an evicted file is not cut off.
+    """
+    def __init__(self, max_open=256):
+        self.max_open = max_open
+        self._reset()
+
+    def _reset(self):
+        # open files and locks do not survive a fork or a pickle
+        self.files = OrderedDict()
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def get(self, key, open_file):
+        """The open file of key, from open_file(key) on a miss."""
+        if self.pid != os.getpid():
+            self._reset()
+        with self.lock:
+            f = self.files.get(key)
+            if f is not None:
+                self.files.move_to_end(key)
+                return f
+        f = open_file(key)
+        with self.lock:
+            # another thread may have opened it in the meantime
+            f = self.files.setdefault(key, f)
+            self.files.move_to_end(key)
+            while len(self.files) > self.max_open:
+                self.files.popitem(last=False)
+        return f
+
+    def __len__(self):
+        return len(self.files)
+
+    def __getstate__(self):
+        return {'max_open': self.max_open}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
@@ -0,0 +1,113 @@
+from math import gcd
+
+import numpy as np
+import scipy.signal
+import librosa
+
+# polyphase qualities: (zero crossings of the sinc on each side, kaiser
+# beta); 'hq' is scipy.signal.resample_poly's default filter
+QUALITIES = {'fast': (4, 5.0), 'hq': (10, 5.0)}
+
+
+def crop(y, first, start, end):
+    """Output samples [start, end) of y, whose first sample is output
+    index `first`; zeros where y does not reach."""
+    out = np.zeros(y.shape[:-1] + (end - start,), dtype=np.float32)
+    lo, hi = max(start, first), min(end, first + y.shape[-1])
+    if hi > lo:
+        out[..., lo - start:hi - start] = y[..., lo - first:hi - first]
+    return out
+
+
+class Resampler(object):
+    """Resample from rate to target, computing only a window of the output.
+
+    quality is one of
+      'nearest': keep every (rate // target)-th sample, aliasing;
+      'fast', 'hq': polyphase FIR (scipy upfirdn), filters cached per
+          (up, down) ratio, only the inputs under the window are read;
+      'librosa': librosa.resample on the window plus a 5% margin.
+    Inputs can be batched as (..., L).
+    """
+    def __init__(self):
+        self.filters = {}
+
+    def ratio(self, rate, target):
+        g = gcd(rate, target)
+        return target // g, rate // g
+
+    def filter(self, up, down, quality):
+        key = (up, down, quality)
+        h = self.filters.get(key)
+        if h is None:
+            zero_crossings, beta = QUALITIES[quality]
+            max_rate = max(up, down)
+            half_len = zero_crossings * max_rate
+            h = scipy.signal.firwin(2 * half_len + 1, 1. / max_rate,
+                                    window=('kaiser', beta)) * up
+            h = h.astype(np.float32)
+            self.filters[key] = h
+        return h
+
+    def output_length(self, num_samples, rate, target, quality='hq'):
+        if quality == 'nearest':
+            return -(-num_samples // (rate // target))
+        up, down = self.ratio(rate, target)
+        return -(-num_samples * up // down)
+
+    def input_range(self, rate, target, start, end, quality='hq'):
+        """Source samples [a, b) needed for output samples [start, end),
+        not clipped to the track."""
+        if quality == 'nearest':
+            step = rate // target
+            return start * step, (end - 1) * step + 1
+        up, down = self.ratio(rate, target)
+        if quality == 'librosa':
+            margin = int(0.05 * rate)
+            a = max(0, start * down // up - margin) // down * down
+            return a, -(-end * down // up) + margin
+        h = self.filter(up, down, quality)
+        half_len = (len(h) - 1) // 2
+        # y[n] = sum_k x[k] h[n * down - k * up + half_len]
+        a = -(-(start * down + half_len - len(h) + 1) // up)
+        b = ((end - 1) * down + half_len) // up + 1
+        return a, b
+
+    def __call__(self, audio, rate, target, start=0, end=None, offset=0,
+                 quality='hq'):
+        """Output samples [start, end) of the track resampled to target.
+
+        audio: (..., L) source samples, audio[..., 0] being sample
+        `offset` of the track. end defaults to the end of the track.
+        """
+        if end is None:
+            end = self.output_length(offset + audio.shape[-1], rate,
+                                     target, quality)
+        a, b = self.input_range(rate, target, start, end, quality)
+        a = max(a, offset)
+        if quality == 'librosa':
+            # aligned so that the window starts on an output sample
+            up, down = self.ratio(rate, target)
+            a = -(-a // down) * down
+        b = min(b, offset + audio.shape[-1])
+        if b <= a:
+            return np.zeros(audio.shape[:-1] + (end - start,), np.float32)
+        audio = audio[..., a - offset:b - offset]
+
+        if quality == 'nearest':
+            step = rate // target
+            first = -(-a // step)
+            y = audio[..., first * step - a::step]
+        elif quality == 'librosa':
+            y = librosa.resample(audio, orig_sr=rate, target_sr=target,
+                                 axis=-1)
+            first = a * up // down
+        else:
+            up, down = self.ratio(rate, target)
+            h = self.filter(up, down, quality)
+            # delay h so that upfirdn output m is track output m + first
+            t = a * up - (len(h) - 1) // 2
+            first = t // down
+            h = np.concatenate([np.zeros(t - first * down, np.float32), h])
+            y = scipy.signal.upfirdn(h, audio, up, down, axis=-1)
+        return crop(y, first, start, end)
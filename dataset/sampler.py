@@ -0,0 +1,35 @@
+import torch
+
+
+class EpochSampler(torch.utils.data.Sampler):
+    """Visits each of num_samples indices dup times per epoch, in random
+    order: the same draws as shuffling list_sample * dup, without the
+    duplicated list living in every worker.
+
+    dup can be changed between epochs to resize them. After
+    set_epoch(epoch, start), the order only depends on seed and epoch and
+    its first start indices are skipped, so that an epoch can be resumed.
+    """
+    def __init__(self, num_samples, dup=1, generator=None, seed=0):
+        self.num_samples = num_samples
+        self.dup = dup
+        self.generator = generator
+        self.seed = seed
+        self.epoch = None
+        self.start = 0
+
+    def set_epoch(self, epoch, start=0):
+        self.epoch = epoch
+        self.start = start
+
+    def __len__(self):
+        return self.num_samples * self.dup - self.start
+
+    def __iter__(self):
+        generator = self.generator
+        if self.epoch is not None:
+            generator = torch.Generator()
+            generator.manual_seed(self.seed + self.epoch)
+        order = torch.randperm(self.num_samples * self.dup,
+                               generator=generator)[self.start:]
+        return iter((order % self.num_samples).tolist())
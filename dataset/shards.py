@@ -0,0 +1,208 @@
+import io
+import os
+import json
+import random
+import tarfile
+
+import numpy as np
+import torch.distributed as dist
+import torch.utils.data as torchdata
+
+from .music import MUSICMixDataset
+
+INDEX = 'index.json'
+# settings a shard record was cut with, checked against opt when reading
+SETTINGS = ['num_frames', 'stride_frames', 'frameRate', 'audRate', 'audLen']
+
+
+def shard_name(i):
+    return 'shard-{:06d}.tar'.format(i)
+
+
+def add_member(tar, name, data):
+    member = tarfile.TarInfo(name)
+    member.size = len(data)
+    tar.addfile(member, io.BytesIO(data))
+
+
+class ShardWriter(object):
+    """Writes crop windows to root/shard-NNNNNN.tar, records_per_shard
+    per shard, and root/index.json listing the shards at close().
+
+    A record <key> is <key>.json (index row and center time), <key>.pcm
+    (float32 audio clip at audRate) and <key>.<t>.jpg (its frames).
+    """
+    def __init__(self, root, opt, records_per_shard=1000):
+        self.root = root
+        self.records_per_shard = records_per_shard
+        self.settings = {name: getattr(opt, name) for name in SETTINGS}
+        self.shards = []
+        self.videos = {}
+        self.tar = None
+        os.makedirs(root, exist_ok=True)
+
+    def write(self, info, center_time, audio, jpegs):
+        if self.tar is None or self.shards[-1][1] == self.records_per_shard:
+            self._next_shard()
+        key = '{:09d}'.format(sum(count for _, count in self.shards))
+        meta = {'info': list(info), 'center_time': center_time}
+        add_member(self.tar, key + '.json', json.dumps(meta).encode('utf-8'))
+        add_member(self.tar, key + '.pcm',
+                   np.ascontiguousarray(audio, dtype=np.float32).tobytes())
+        for t, jpeg in enumerate(jpegs):
+            add_member(self.tar, '{}.{}.jpg'.format(key, t), jpeg)
+        self.shards[-1][1] += 1
+        self.videos[info[1]] = list(info)
+
+    def _next_shard(self):
+        if self.tar is not None:
+            self.tar.close()
+        name = shard_name(len(self.shards))
+        self.tar = tarfile.open(os.path.join(self.root, name), 'w')
+        self.shards.append([name, 0])
+
+    def close(self):
+        if self.tar is not None:
+            self.tar.close()
+        index = dict(self.settings, shards=self.shards,
+                     videos=list(self.videos.values()))
+        with open(os.path.join(self.root, INDEX), 'w') as f:
+            json.dump(index, f)
+
+
+def read_shard(path):
+    """Records of a shard, in order, as (info, audio, jpegs). The tar
+    is read as a stream, one sequential pass."""
+    key, record = None, None
+    with tarfile.open(path, 'r|') as tar:
+        for member in tar:
+            name = member.name.split('.', 1)
+            data = tar.extractfile(member).read()
+            if name[0] != key:
+                if record is not None:
+                    yield record
+                key, record = name[0], [None, None, []]
+            if name[1] == 'json':
+                record[0] = json.loads(data.decode('utf-8'))['info']
+            elif name[1] == 'pcm':
+                record[1] = np.frombuffer(data, dtype=np.float32)
+            else:
+                record[2].append(data)
+    if record is not None:
+        yield record
+
+
+class MUSICShardDataset(torchdata.IterableDataset, MUSICMixDataset):
+    """MUSICMixDataset streamed from the tar shards of
+    scripts/create_shards.py, read sequentially instead of per frame.
+
+    Each epoch shuffles the shard order (seeded by epoch) and deals the
+    shards to the rank x worker slots. Every slot streams its shards
+    through a shuffle buffer: a record drawn from it is mixed with
+    num_mix-1 other buffered records. An epoch yields every record once
+    as the first source. set_epoch(epoch, start_batch) restarts an epoch
+    at a given loader batch, skipped records are read but not decoded.
+    """
+    def __init__(self, root, opt, split='train'):
+        self.root = root
+        with open(os.path.join(root, INDEX), 'r') as f:
+            index = json.load(f)
+        for name in SETTINGS:
+            if index[name] != getattr(opt, name):
+                raise ValueError('shards in {} have {}={}, not {}'.format(
+                    root, name, index[name], getattr(opt, name)))
+        super(MUSICShardDataset, self).__init__(
+            index['videos'], opt, split=split)
+        self.shards = index['shards']
+        self.buffer_size = opt.shard_buffer
+        self.batch_size = opt.batch_size
+        self.epoch = 0
+        self.start_batch = 0
+
+    def __len__(self):
+        # records of this rank, the shards being dealt to world_size ranks
+        _, world_size = self._rank()
+        return -(-sum(count for _, count in self.shards) // world_size)
+
+    def _rank(self):
+        if dist.is_available() and dist.is_initialized():
+            return dist.get_rank(), dist.get_world_size()
+        return 0, 1
+
+    def set_epoch(self, epoch, start_batch=0):
+        self.epoch = epoch
+        self.start_batch = start_batch
+
+    def _slot(self):
+        """(slot, number of slots, batches to skip) of this worker."""
+        worker = torchdata.get_worker_info()
+        worker_id, num_workers = 0, 1
+        if worker is not None:
+            worker_id, num_workers = worker.id, worker.num_workers
+        rank, world_size = self._rank()
+        # the loader takes batches from its workers in turn, always
+        # starting with worker 0: after start_batch batches, worker 0
+        # plays the part of worker start_batch % num_workers
+        role = (worker_id + self.start_batch) % num_workers
+        skip = max(0, -(-(self.start_batch - role) // num_workers))
+        return rank * num_workers + role, world_size * num_workers, skip
+
+    def _records(self, shards):
+        for i in shards:
+            for record in read_shard(os.path.join(self.root, self.shards[i][0])):
+                yield record
+
+    def _groups(self, rng, records):
+        """Lists of num_mix records, the first drawn out of the buffer.
+        The buffer is drained to the last record, so that every record
+        is drawn first once."""
+        buffer = []
+        drawn = []
+        for record in records:
+            buffer.append(record)
+            if len(buffer) < self.buffer_size:
+                continue
+            yield self._draw(rng, buffer, drawn)
+        while buffer:
+            yield self._draw(rng, buffer, drawn)
+
+    def _draw(self, rng, buffer, drawn):
+        i = rng.randrange(len(buffer))
+        buffer[i], buffer[-1] = buffer[-1], buffer[i]
+        first = buffer.pop()
+        k = self.num_mix - 1
+        if len(buffer) >= k:
+            partners = rng.sample(buffer, k)
+        else:
+            # the last records are mixed with recently drawn ones
+            pool = buffer + drawn
+            if len(pool) >= k:
+                partners = rng.sample(pool, k)
+            else:
+                partners = rng.choices(pool or [first], k=k)
+        drawn.append(first)
+        del drawn[:-self.num_mix]
+        return [first] + partners
+
+    def __iter__(self):
+        slot, num_slots, skip = self._slot()
+        shards = list(range(len(self.shards)))
+        random.Random(self.seed + self.epoch).shuffle(shards)
+        rng = random.Random('{}-{}-{}'.format(self.seed, self.epoch, slot))
+        skip *= self.batch_size
+
+        for group in self._groups(rng, self._records(shards[slot::num_slots])):
+            if skip > 0:
+                skip -= 1
+                continue
+            infos = [info for info, _, _ in group]
+            try:
+                frames = [self.vid_transform(self._decode_jpegs(jpegs))
+                          for _, _, jpegs in group]
+                audios = [self._augment_audio(audio.copy())
+                          for _, audio, _ in group]
+                mag_mix, mags, phase_mix = self._mix(audios)
+            except Exception as e:
+                print('Failed decoding {}: {}'.format(infos[0][1], e))
+                continue
+            yield self._item(infos, frames, audios, mag_mix, mags, phase_mix)
@@ -0,0 +1,65 @@
+import numpy as np
+import scipy.signal
+import torch
+
+
+class STFT(object):
+    """Batched STFT, same output as librosa.stft(center=True, window='hann').
+
+    Any leading dims of the input are batched into one vectorized FFT:
+    (..., L) float -> (..., n_fft // 2 + 1, num_frames) complex64.
+    The window and the per-length frame plan are computed once.
+    """
+    def __init__(self, n_fft, hop_length, pad_mode='constant'):
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.pad_mode = pad_mode
+        self.window = scipy.signal.get_window('hann', n_fft, fftbins=True)
+        self.plans = {}
+
+    def num_frames(self, length):
+        plan = self.plans.get(length)
+        if plan is None:
+            padded = length + 2 * (self.n_fft // 2)
+            plan = 1 + (padded - self.n_fft) // self.hop_length
+            self.plans[length] = plan
+        return plan
+
+    def __call__(self, audio):
+        audio = np.asarray(audio)
+        num_frames = self.num_frames(audio.shape[-1])
+
+        # centered frames, as strided views of the padded signal
+        pad = [(0, 0)] * (audio.ndim - 1) + [(self.n_fft // 2, self.n_fft // 2)]
+        audio = np.pad(audio, pad, mode=self.pad_mode)
+        frames = np.lib.stride_tricks.sliding_window_view(
+            audio, self.n_fft, axis=-1)
+        frames = frames[..., :num_frames * self.hop_length:self.hop_length, :]
+
+        spec = np.fft.rfft(frames * self.window, axis=-1)
+        return np.swapaxes(spec, -1, -2).astype(np.complex64)
+
+
+def mix_and_stft_torch(audios, n_fft, hop_length, phase=True):
+    """Device-side twin of BaseDataset._mix_n_and_stft.
+
+    audios: N tensors of Bx(L), or one BxNx(L) tensor, already scaled
+    by 1/N. All sources go through one batched torch.stft, the mixture
+    spectrum is their sum.
+    Returns mag_mix Bx1xHxW, N mags Bx1xHxW and phase_mix (or None).
+    """
+    if not torch.is_tensor(audios):
+        audios = torch.stack(list(audios), dim=1)
+    B, N, L = audios.size()
+    window = torch.hann_window(n_fft, device=audios.device)
+    specs = torch.stft(
+        audios.reshape(B * N, L), n_fft, hop_length=hop_length,
+        window=window, center=True, pad_mode='constant',
+        return_complex=True)
+    specs = specs.reshape(B, N, *specs.shape[-2:])
+    spec_mix = specs.sum(dim=1, keepdim=True)
+
+    mags = list(specs.abs().unbind(dim=1))
+    mags = [mag.unsqueeze(1) for mag in mags]
+    phase_mix = spec_mix.angle() if phase else None
+    return spec_mix.abs(), mags, phase_mix
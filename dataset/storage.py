@@ -0,0 +1,184 @@
+import io
+import os
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# guards the lazy client setup of S3Storage, renewed in forked children
+# (a parent thread may have held it at fork time)
+_connect_lock = threading.Lock()
+
+
+def _renew_connect_lock():
+    global _connect_lock
+    _connect_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_renew_connect_lock)
+
+
+class LocalStorage(object):
+    """Dataset paths read from the local filesystem, as they are."""
+    remote = False
+
+    def open(self, path):
+        # decoders take the path itself
+        return path
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def read_many(self, paths):
+        return [self.read(path) for path in paths]
+
+    def read_ranges(self, path, ranges):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            return [os.pread(fd, end - start, start) for start, end in ranges]
+        finally:
+            os.close(fd)
+
+
+class S3Storage(object):
+    """Dataset paths read as objects of an S3 compatible store.
+
+    A path maps to the key <prefix>/<normalized path>, e.g.
+    s3://corpus/music + ./data/frames/x.mp4/000001.jpg gives
+    data/frames/x.mp4/000001.jpg under music/ in bucket corpus.
+    Each process (DataLoader worker) opens its own client, with a pool
+    of `pool` connections shared by a thread pool for concurrent
+    requests. Byte ranges of one object closer than coalesce bytes are
+    fetched by a single ranged GET.
+
+    With cache_dir, objects are copied whole to
+    cache_dir/<bucket>/<key> on first use and read locally afterwards.
+    The cache is not bounded.
+    """
+    remote = True
+
+    def __init__(self, url, endpoint_url='', cache_dir='', pool=16,
+                 coalesce=512 << 10):
+        assert url.startswith('s3://'), 'not an s3:// url: {}'.format(url)
+        self.bucket, _, self.prefix = url[len('s3://'):].partition('/')
+        self.endpoint_url = endpoint_url or None
+        self.cache_dir = cache_dir
+        self.pool = pool
+        self.coalesce = coalesce
+        self.num_requests = 0
+        self.num_bytes = 0
+        self._client = None
+        self._executor = None
+        self._pid = None
+
+    def __getstate__(self):
+        # clients and threads are per process
+        state = self.__dict__.copy()
+        state['_client'] = None
+        state['_executor'] = None
+        return state
+
+    @property
+    def client(self):
+        if self._client is None or self._pid != os.getpid():
+            # once per process, however many I/O threads get here
+            with _connect_lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._connect()
+        return self._client
+
+    def _connect(self):
+        import boto3
+        from botocore.config import Config
+        config = Config(max_pool_connections=self.pool,
+                        retries={'max_attempts': 5, 'mode': 'adaptive'})
+        self._executor = ThreadPoolExecutor(self.pool)
+        self._client = boto3.session.Session().client(
+            's3', endpoint_url=self.endpoint_url, config=config)
+        # set last, threads check it without the lock
+        self._pid = os.getpid()
+
+    @property
+    def executor(self):
+        self.client
+        return self._executor
+
+    def key(self, path):
+        path = os.path.normpath(path).replace(os.sep, '/').lstrip('/')
+        return posixpath.join(self.prefix, path) if self.prefix else path
+
+    def cache_path(self, path):
+        return os.path.join(self.cache_dir, self.bucket, self.key(path))
+
+    def _get(self, path, start=None, end=None):
+        kwargs = {'Bucket': self.bucket, 'Key': self.key(path)}
+        if start is not None:
+            kwargs['Range'] = 'bytes={}-{}'.format(start, end - 1)
+        try:
+            body = self.client.get_object(**kwargs)['Body']
+        except self.client.exceptions.NoSuchKey:
+            raise FileNotFoundError('s3://{}/{}'.format(
+                self.bucket, kwargs['Key']))
+        with body:
+            data = body.read()
+        self.num_requests += 1
+        self.num_bytes += len(data)
+        return data
+
+    def _cached(self, path):
+        """Local copy of path, fetched on first use."""
+        filename = self.cache_path(path)
+        if not os.path.exists(filename):
+            data = self._get(path)
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            tmp = '{}.{}.tmp'.format(filename, os.getpid())
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, filename)
+        return filename
+
+    def open(self, path):
+        """A local path or a file object of path, for decoders."""
+        if self.cache_dir:
+            return self._cached(path)
+        return io.BytesIO(self._get(path))
+
+    def read(self, path):
+        if self.cache_dir:
+            return LocalStorage().read(self._cached(path))
+        return self._get(path)
+
+    def read_many(self, paths):
+        """Objects of paths, requested concurrently."""
+        return list(self.executor.map(self.read, paths))
+
+    def read_ranges(self, path, ranges):
+        """Bytes [start, end) of path for each (start, end) in ranges."""
+        if self.cache_dir:
+            return LocalStorage().read_ranges(self._cached(path), ranges)
+        # merge ranges with small gaps, one request per group
+        order = sorted(range(len(ranges)), key=lambda i: ranges[i][0])
+        groups = []
+        for i in order:
+            start, end = ranges[i]
+            if groups and start - groups[-1][1] <= self.coalesce:
+                groups[-1][1] = max(groups[-1][1], end)
+                groups[-1][2].append(i)
+            else:
+                groups.append([start, end, [i]])
+        datas = self.executor.map(
+            lambda group: self._get(path, group[0], group[1]), groups)
+        out = [None] * len(ranges)
+        for (first, _, members), data in zip(groups, datas):
+            for i in members:
+                start, end = ranges[i]
+                out[i] = data[start - first:end - first]
+        return out
+
+
+def open_storage(opt):
+    """Storage of the dataset paths of opt (--storage and friends)."""
+    if not opt.storage:
+        return LocalStorage()
+    return S3Storage(opt.storage, opt.storage_endpoint, opt.storage_cache,
+                     opt.storage_pool)
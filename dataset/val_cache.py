@@ -0,0 +1,138 @@
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+import torch
+import torch.utils.data as torchdata
+
+# settings that change what a validation item holds
+SETTINGS = ['num_mix', 'num_frames', 'stride_frames', 'frameRate', 'imgSize',
+            'audRate', 'audLen', 'stft_frame', 'stft_hop', 'stft_device',
+            'frames_device', 'frame_mode', 'frame_decoder', 'audio_mode',
+            'jpeg_draft', 'resample', 'num_val']
+
+
+def cache_key(list_sample, opt, dataset):
+    """Hash of the index file contents, the dataset class and SETTINGS."""
+    sha = hashlib.sha1(type(dataset).__name__.encode('utf-8'))
+    if isinstance(list_sample, str):
+        with open(list_sample, 'rb') as f:
+            sha.update(f.read())
+    else:
+        sha.update(json.dumps(list_sample).encode('utf-8'))
+    settings = {name: getattr(opt, name) for name in SETTINGS}
+    sha.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    return sha.hexdigest()[:16]
+
+
+def write_items(root, items, num_items):
+    """Save num_items dicts of tensors, lists of tensors and 'infos' as
+    one (num_items, ...) .npy per tensor plus a json of the rest.
+
+    Raises on an item that failed to load, rather than saving the dummy
+    (all zero) item the dataset returns for it.
+    """
+    fields, arrays, infos = {}, {}, []
+    for i, item in enumerate(items):
+        # dummy items of MUSICMixDataset have empty infos
+        if any(not info for info in item.get('infos', [])):
+            raise RuntimeError('validation item {} failed to load, see the '
+                               'error above'.format(i))
+        if i == 0:
+            for key, value in item.items():
+                if torch.is_tensor(value):
+                    fields[key] = 0
+                    parts = {key: value}
+                elif isinstance(value, list) and value and \
+                        torch.is_tensor(value[0]):
+                    fields[key] = len(value)
+                    parts = {'{}.{}'.format(key, n): v
+                             for n, v in enumerate(value)}
+                else:
+                    continue
+                for name, v in parts.items():
+                    arrays[name] = np.lib.format.open_memmap(
+                        os.path.join(root, name + '.npy'), mode='w+',
+                        dtype=v.numpy().dtype, shape=(num_items,) + tuple(v.shape))
+        for key, count in fields.items():
+            if count == 0:
+                arrays[key][i] = item[key].numpy()
+            else:
+                for n in range(count):
+                    arrays['{}.{}'.format(key, n)][i] = item[key][n].numpy()
+        infos.append(item.get('infos'))
+
+    for array in arrays.values():
+        array.flush()
+    with open(os.path.join(root, 'meta.json'), 'w') as f:
+        json.dump({'num_items': num_items, 'fields': fields,
+                   'infos': infos}, f)
+
+
+class MaterializedDataset(torchdata.Dataset):
+    """Items of a deterministic dataset, read back from write_items output
+    with no decoding, resizing or STFT."""
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        self.num_items = meta['num_items']
+        self.fields = meta['fields']
+        self.infos = meta['infos']
+        self.arrays = None
+
+    def __len__(self):
+        return self.num_items
+
+    def _load(self, name):
+        return np.load(os.path.join(self.root, name + '.npy'), mmap_mode='r')
+
+    def __getitem__(self, i):
+        if self.arrays is None:
+            # opened lazily, once per worker
+            self.arrays = {}
+            for key, count in self.fields.items():
+                if count == 0:
+                    self.arrays[key] = self._load(key)
+                else:
+                    self.arrays[key] = [self._load('{}.{}'.format(key, n))
+                                        for n in range(count)]
+        item = {}
+        for key, count in self.fields.items():
+            if count == 0:
+                item[key] = torch.from_numpy(np.array(self.arrays[key][i]))
+            else:
+                item[key] = [torch.from_numpy(np.array(array[i]))
+                             for array in self.arrays[key]]
+        if self.infos[i] is not None:
+            item['infos'] = self.infos[i]
+        return item
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['arrays'] = None
+        return state
+
+
+def materialize(dataset, list_sample, opt, root, num_workers=4):
+    """MaterializedDataset of a deterministic dataset (split 'val'),
+    built on first use under root/<cache_key>."""
+    path = os.path.join(root, cache_key(list_sample, opt, dataset))
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        print('Materializing {} validation items to {}...'.format(
+            len(dataset), path))
+        tmp = path + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        loader = torchdata.DataLoader(
+            dataset, batch_size=None, shuffle=False, num_workers=num_workers)
+        try:
+            write_items(tmp, loader, len(dataset))
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+    return MaterializedDataset(path)
@@ -1,10 +1,19 @@
 import random
 import numbers
+import numpy as np
 import torchvision.transforms.functional as F
+import torch.nn.functional as nnF
 from PIL import Image
 import torch
 
 
+def frame_size(frame):
+    """(width, height) of a PIL Image or of a C x H x W tensor."""
+    if torch.is_tensor(frame):
+        return frame.shape[-1], frame.shape[-2]
+    return frame.size
+
+
 class Resize(object):
     def __init__(self, size, interpolation=Image.BILINEAR):
         self.size = size
@@ -13,10 +22,18 @@ class Resize(object):
     def __call__(self, frames):
         """
         Args:
-            frames: a list of PIL Image
+            frames: a list of PIL Image, or of uint8 tensors (C x H x W)
         Returns:
             a list of PIL Image: Rescaled images.
         """
+        if torch.is_tensor(frames[0]):
+            # all frames in one call
+            interpolation = self.interpolation
+            if isinstance(interpolation, int):
+                interpolation = F._interpolation_modes_from_int(interpolation)
+            frames = F.resize(torch.stack(frames), self.size, interpolation,
+                              antialias=True)
+            return list(frames.unbind(0))
         out_frames = []
         for frame in frames:
             out_frames.append(F.resize(frame, self.size, self.interpolation))
@@ -63,7 +80,7 @@ class RandomCrop(object):
         Returns:
             tuple: params (i, j, h, w) to be passed to ``crop`` for random crop.
         """
-        w, h = frames[0].size
+        w, h = frame_size(frames[0])
         th, tw = output_size
         if w == tw and h == th:
             return 0, 0, h, w
@@ -130,6 +147,60 @@ class RandomHorizontalFlip(object):
         return self.__class__.__name__ + '(p={})'.format(self.p)
 
 
+class SquareCrop(object):
+    """Crop the long side of the given PIL Images to their short side,
+    at a random (same for all frames) or centered offset.
+    """
+
+    def __init__(self, random_offset=True):
+        self.random_offset = random_offset
+
+    def __call__(self, frames):
+        """
+        Args:
+            frames: a list of PIL Image
+        Returns:
+            a list of PIL Image: Square images.
+        """
+        w, h = frame_size(frames[0])
+        size = min(w, h)
+        if self.random_offset:
+            i = random.randint(0, h - size)
+            j = random.randint(0, w - size)
+        else:
+            i = int(round((h - size) / 2.))
+            j = int(round((w - size) / 2.))
+
+        out_frames = []
+        for frame in frames:
+            out_frames.append(F.crop(frame, i, j, size, size))
+        return out_frames
+
+    def __repr__(self):
+        return self.__class__.__name__ + '(random_offset={})'.format(self.random_offset)
+
+
+class ToUint8Tensor(object):
+    """Convert a list of ``PIL Image`` (H x W x C) to uint8 tensors of
+    shape (C x H x W), without scaling.
+    """
+
+    def __call__(self, frames):
+        """
+        Args:
+            frames: a list of PIL Image.
+        Returns:
+            a list of Tensor: Converted images.
+        """
+        if torch.is_tensor(frames[0]):
+            return frames
+        out_frames = []
+        for frame in frames:
+            frame = torch.from_numpy(np.asarray(frame, dtype=np.uint8).copy())
+            out_frames.append(frame.permute(2, 0, 1))
+        return out_frames
+
+
 class ToTensor(object):
     """Convert a list of ``PIL Image`` or ``numpy.ndarray`` to tensor.
     Converts a list of PIL Image or numpy.ndarray (H x W x C) in the range
@@ -146,7 +217,11 @@ class ToTensor(object):
         """
         out_frames = []
         for frame in frames:
-            out_frames.append(F.to_tensor(frame))
+            if torch.is_tensor(frame):
+                # uint8 C x H x W, from torchvision.io.decode_jpeg
+                out_frames.append(frame.float().div_(255))
+            else:
+                out_frames.append(F.to_tensor(frame))
         return out_frames
 
 
@@ -180,3 +255,47 @@ class Stack(object):
             Tensor: a video Tensor of size (C, L, H, W).
         """
         return torch.stack(frames, dim=self.dim)
+
+
+class DeviceAugment(object):
+    """Batched twin of the per-frame transforms, run where the batch lives.
+
+    Takes uint8 clips of B x C x T x S x S, as returned by the loaders
+    with --frames_device (resized, square cropped), and returns
+    normalized float clips of B x C x T x size x size.
+    Training: random crop and horizontal flip, drawn per sample,
+    applied as a single gather. Otherwise: resize to size.
+    """
+
+    def __init__(self, size, mean=(0.485, 0.456, 0.406),
+                 std=(0.229, 0.224, 0.225)):
+        self.size = size
+        self.mean = mean
+        self.std = std
+
+    def __call__(self, frames, train=True):
+        B, C, T, S, _ = frames.size()
+        device = frames.device
+
+        if train:
+            i = torch.randint(0, S - self.size + 1, (B, 1), device=device)
+            j = torch.randint(0, S - self.size + 1, (B, 1), device=device)
+            flip = torch.rand(B, 1, device=device) < 0.5
+            r = torch.arange(self.size, device=device).unsqueeze(0)
+            rows = i + r
+            cols = j + torch.where(flip, self.size - 1 - r, r)
+            b = torch.arange(B, device=device).view(B, 1, 1)
+            # advanced indices go first: B x size x size x C x T
+            frames = frames[b, :, :, rows.unsqueeze(2), cols.unsqueeze(1)]
+            frames = frames.permute(0, 3, 4, 1, 2).float()
+        else:
+            frames = frames.reshape(B, C * T, S, S).float()
+            if S != self.size:
+                frames = nnF.interpolate(
+                    frames, size=(self.size, self.size), mode='bicubic',
+                    align_corners=False, antialias=True).clamp_(0, 255)
+            frames = frames.reshape(B, C, T, self.size, self.size)
+
+        mean = torch.tensor(self.mean, device=device).view(1, C, 1, 1, 1)
+        std = torch.tensor(self.std, device=device).view(1, C, 1, 1, 1)
+        return (frames / 255. - mean) / std
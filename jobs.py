@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class JobState(object):
+    """Per-job status (done/failed, attempts, seconds, error) persisted
+    to a json file, so an interrupted run can skip finished jobs.
+    """
+    def __init__(self, filename, save_every=1.):
+        self.filename = filename
+        self.save_every = save_every
+        self.lock = threading.Lock()
+        self.last_save = 0.
+        self.jobs = {}
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
+                self.jobs = json.load(f)
+
+    def is_done(self, key):
+        return self.jobs.get(key, {}).get('status') == 'done'
+
+    def update(self, key, **fields):
+        with self.lock:
+            self.jobs.setdefault(key, {}).update(fields)
+            # rewriting the whole file per job would dominate short jobs
+            if time.time() - self.last_save > self.save_every:
+                self._save()
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        dirname = os.path.dirname(self.filename)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.jobs, f, indent=1)
+        os.replace(tmp, self.filename)
+        self.last_save = time.time()
+
+    def summary(self):
+        counts = {}
+        for job in self.jobs.values():
+            counts[job['status']] = counts.get(job['status'], 0) + 1
+        return counts
+
+
+def run_jobs(jobs, work, state, num_workers=4, max_retries=2):
+    """Run work(*args) for every (key, args) in jobs not yet done in state.
+
+    At most num_workers jobs run at once; the work is expected to spend
+    its time in subprocesses (ffmpeg, yt-dlp), so threads are enough to
+    keep that many processes busy. A job raising an exception is retried
+    up to max_retries times. A dict returned by work is saved with the
+    job's state. Returns the keys that still failed.
+    """
+    def attempt(key, args):
+        for n in range(1, max_retries + 2):
+            tic = time.time()
+            state.update(key, status='running', attempts=n)
+            try:
+                result = work(*args) or {}
+            except Exception as e:
+                print('Failed {} (attempt {}): {}'.format(key, n, e))
+                state.update(key, status='failed',
+                             seconds=time.time() - tic, error=str(e))
+                continue
+            state.update(key, status='done',
+                         seconds=time.time() - tic, error=None, **result)
+            return True
+        return False
+
+    pending = [(key, args) for key, args in jobs if not state.is_done(key)]
+    print('{} jobs, {} already done.'.format(
+        len(jobs), len(jobs) - len(pending)))
+
+    failed = []
+    try:
+        with ThreadPoolExecutor(num_workers) as pool:
+            futures = {pool.submit(attempt, key, args): key
+                       for key, args in pending}
+            for i, future in enumerate(as_completed(futures)):
+                if not future.result():
+                    failed.append(futures[future])
+                if (i + 1) % 100 == 0:
+                    print('[{}/{}] {}'.format(
+                        i + 1, len(pending), state.summary()))
+    finally:
+        state.save()
+    return failed
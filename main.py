@@ -2,6 +2,7 @@
 import os
 import random
 import time
+from functools import partial
 
 # Numerical libs
 import torch
@@ -14,7 +15,13 @@ import imageio
 
 # Our libs
 from arguments import ArgParser
-from dataset import MUSICMixDataset
+from dataset import MUSICMixDataset, MUSICNoMixDataset, mix_in_batch
+from dataset.stft import mix_and_stft_torch
+from dataset.sampler import EpochSampler
+from dataset.shards import MUSICShardDataset
+from dataset.collate import stack_collate, sources
+from dataset.val_cache import materialize
+from dataset.video_transforms import DeviceAugment
 from models import ModelBuilder, activate
 from utils import AverageMeter, \
     recover_rgb, magnitude2heatmap,\
@@ -31,13 +38,37 @@ class NetWrapper(torch.nn.Module):
         self.crit = crit
 
     def forward(self, batch_data, args):
-        mag_mix = batch_data['mag_mix']
-        mags = batch_data['mags']
+        if 'audio' in batch_data:
+            # --mix_in_batch: loaders send single-source clips
+            batch_data = mix_in_batch(
+                batch_data, args.num_mix, args.mix_pairings)
+        device_outputs = {}
+        if 'mag_mix' in batch_data:
+            mag_mix = batch_data['mag_mix']
+            mags = sources(batch_data['mags'])
+        else:
+            # --stft_device: loaders only send waveforms
+            mag_mix, mags, phase_mix = mix_and_stft_torch(
+                batch_data['audios'], args.stft_frame, args.stft_hop,
+                phase=not self.training)
+            if not self.training:
+                device_outputs = {'stft_mag_mix': mag_mix,
+                                  'stft_phase_mix': phase_mix}
         frames = batch_data['frames']
         mag_mix = mag_mix + 1e-10
 
         N = args.num_mix
         B = mag_mix.size(0)
+        if frames[0].dtype == torch.uint8:
+            # --frames_device: loaders only send raw frames
+            augment = DeviceAugment(args.imgSize)
+            if torch.is_tensor(frames):
+                frames = augment(frames.flatten(0, 1), self.training)
+                frames = frames.view(B, N, *frames.shape[1:])
+            else:
+                frames = [augment(frames[n], self.training) for n in range(N)]
+            if not self.training:
+                device_outputs['frames'] = frames
         T = mag_mix.size(3)
 
         # 0.0 warp the spectrogram
@@ -75,9 +106,15 @@ class NetWrapper(torch.nn.Module):
 
         # 2. forward net_frame -> Bx1xC
         feat_frames = [None for n in range(N)]
-        for n in range(N):
-            feat_frames[n] = self.net_frame.forward_multiframe(frames[n])
-            feat_frames[n] = activate(feat_frames[n], args.img_activation)
+        if torch.is_tensor(frames):
+            # --stack_collate: all sources in one pass of B*N clips
+            feat = self.net_frame.forward_multiframe(frames.flatten(0, 1))
+            feat = activate(feat, args.img_activation)
+            feat_frames = sources(feat.view(B, N, *feat.shape[1:]))
+        else:
+            for n in range(N):
+                feat_frames[n] = self.net_frame.forward_multiframe(frames[n])
+                feat_frames[n] = activate(feat_frames[n], args.img_activation)
 
         # 3. sound synthesizer
         pred_masks = [None for n in range(N)]
@@ -88,9 +125,22 @@ class NetWrapper(torch.nn.Module):
         # 4. loss
         err = self.crit(pred_masks, gt_masks, weight).reshape(1)
 
-        return err, \
-            {'pred_masks': pred_masks, 'gt_masks': gt_masks,
-             'mag_mix': mag_mix, 'mags': mags, 'weight': weight}
+        outputs = {'pred_masks': pred_masks, 'gt_masks': gt_masks,
+                   'mag_mix': mag_mix, 'mags': mags, 'weight': weight}
+        outputs.update(device_outputs)
+        return err, outputs
+
+
+# With --stft_device / --frames_device the linear spectrogram, phase and
+# normalized frames only exist on the device, bring them back for
+# metrics and visualization
+def fetch_device_outputs(batch_data, outputs):
+    if 'mag_mix' not in batch_data:
+        batch_data['mag_mix'] = outputs['stft_mag_mix'].cpu()
+        batch_data['phase_mix'] = outputs['stft_phase_mix'].cpu()
+    if 'frames' in outputs:
+        batch_data['frames'] = [frame.cpu()
+                                for frame in sources(outputs['frames'])]
 
 
 # Calculate metrics
@@ -104,7 +154,7 @@ def calc_metrics(batch_data, outputs, args):
     # fetch data and predictions
     mag_mix = batch_data['mag_mix']
     phase_mix = batch_data['phase_mix']
-    audios = batch_data['audios']
+    audios = sources(batch_data['audios'])
 
     pred_masks_ = outputs['pred_masks']
 
@@ -174,7 +224,7 @@ def output_visuals(vis_rows, batch_data, outputs, args):
     # fetch data and predictions
     mag_mix = batch_data['mag_mix']
     phase_mix = batch_data['phase_mix']
-    frames = batch_data['frames']
+    frames = sources(batch_data['frames'])
     infos = batch_data['infos']
 
     pred_masks_ = outputs['pred_masks']
@@ -324,6 +374,7 @@ def evaluate(netWrapper, loader, history, epoch, args):
         # forward pass
         err, outputs = netWrapper.forward(batch_data, args)
         err = err.mean()
+        fetch_device_outputs(batch_data, outputs)
 
         loss_meter.update(err.item())
         print('[Eval] iter {}, loss: {:.4f}'.format(i, err.item()))
@@ -370,10 +421,13 @@ def train(netWrapper, loader, optimizer, history, epoch, args):
     # switch to train mode
     netWrapper.train()
 
+    # batches of a resumed epoch already trained on are not loaded
+    first = args.resume_batch if epoch == args.resume_epoch else 0
+
     # main loop
     torch.cuda.synchronize()
     tic = time.perf_counter()
-    for i, batch_data in enumerate(loader):
+    for i, batch_data in enumerate(loader, first):
         # measure data time
         torch.cuda.synchronize()
         data_time.update(time.perf_counter() - tic)
@@ -405,6 +459,11 @@ def train(netWrapper, loader, optimizer, history, epoch, args):
             history['train']['epoch'].append(fractional_epoch)
             history['train']['err'].append(err.item())
 
+        if args.ckpt_iter and (i + 1) % args.ckpt_iter == 0:
+            module = netWrapper.module
+            nets = (module.net_sound, module.net_frame, module.net_synthesizer)
+            checkpoint_state(nets, optimizer, history, epoch, i + 1, args)
+
 
 def checkpoint(nets, history, epoch, args):
     print('Saving checkpoints at {} epochs.'.format(epoch))
@@ -432,6 +491,45 @@ def checkpoint(nets, history, epoch, args):
                    '{}/synthesizer_{}'.format(args.ckpt, suffix_best))
 
 
+def checkpoint_state(nets, optimizer, history, epoch, batch, args):
+    """Save what a run needs to go on from batch `batch` of `epoch`:
+    weights, optimizer state, history and learning rates."""
+    state = {'epoch': epoch, 'batch': batch,
+             'nets': [net.state_dict() for net in nets],
+             'optimizer': optimizer.state_dict(),
+             'history': history,
+             'lr': [args.lr_sound, args.lr_frame, args.lr_synthesizer],
+             'best_err': args.best_err}
+    filename = '{}/state_latest.pth'.format(args.ckpt)
+    # never leave a half written state behind
+    torch.save(state, filename + '.tmp')
+    os.replace(filename + '.tmp', filename)
+
+
+def load_state(nets, optimizer, history, args):
+    """Restore the state saved by checkpoint_state, which must be at
+    --resume_epoch / --resume_batch."""
+    filename = '{}/state_latest.pth'.format(args.ckpt)
+    state = torch.load(filename, map_location='cpu', weights_only=False)
+    if (state['epoch'], state['batch']) != (args.resume_epoch, args.resume_batch):
+        raise ValueError(
+            '{} is at epoch {} batch {}, resume with --resume_epoch {} '
+            '--resume_batch {}'.format(filename, state['epoch'], state['batch'],
+                                       state['epoch'], state['batch']))
+    for net, weights in zip(nets, state['nets']):
+        net.load_state_dict(weights)
+    optimizer.load_state_dict(state['optimizer'])
+    history.update(state['history'])
+    args.lr_sound, args.lr_frame, args.lr_synthesizer = state['lr']
+    args.best_err = state['best_err']
+    print('Resumed from {} at epoch {} batch {}.'.format(
+        filename, state['epoch'], state['batch']))
+
+
+def resuming(args):
+    return args.resume_epoch > 1 or args.resume_batch > 0
+
+
 def create_optimizer(nets, args):
     """
     Create an optimizer for training different parts of the model based on vis_train_mode.
@@ -508,24 +606,57 @@ def main(args):
     crit = builder.build_criterion(arch=args.loss)
 
     # Dataset and Loader
-    dataset_train = MUSICMixDataset(
-        args.list_train, args, split='train')
+    if args.shards:
+        # sequential reads of prepacked crop windows
+        assert not args.mix_in_batch, '--shards yields mixtures'
+        dataset_train = MUSICShardDataset(args.shards, args, split='train')
+    elif args.mix_in_batch:
+        # single clips, mixed on the device
+        dataset_train = MUSICNoMixDataset(
+            args.list_train, args, split='train')
+    else:
+        dataset_train = MUSICMixDataset(
+            args.list_train, args, split='train')
     dataset_val = MUSICMixDataset(
         args.list_val, args, max_sample=args.num_val, split='val')
-
+    if args.val_cache:
+        # val items are deterministic, decode them once for all evaluations
+        dataset_val = materialize(
+            dataset_val, args.list_val, args, args.val_cache,
+            num_workers=min(int(args.workers), 8))
+
+    if args.shards:
+        # an epoch streams every shard record once
+        sampler_train = None
+        num_train = len(dataset_train)
+    else:
+        # one epoch visits the train list dup_trainset times
+        sampler_train = EpochSampler(len(dataset_train), args.dup_trainset,
+                                     seed=args.seed)
+        num_train = len(sampler_train)
+    pin_memory = bool(args.pin_memory) and torch.cuda.is_available()
+    collate_train, collate_val = None, None
+    if args.stack_collate:
+        # sources as B x N x ... tensors rather than lists of N tensors
+        collate_train = partial(stack_collate, pin_memory=pin_memory and
+                                int(args.workers) == 0)
+        collate_val = stack_collate
     loader_train = torch.utils.data.DataLoader(
         dataset_train,
         batch_size=args.batch_size,
-        shuffle=True,
+        sampler=sampler_train,
         num_workers=int(args.workers),
+        collate_fn=collate_train,
+        pin_memory=pin_memory and int(args.workers) > 0,
         drop_last=True)
     loader_val = torch.utils.data.DataLoader(
         dataset_val,
         batch_size=args.batch_size,
         shuffle=False,
         num_workers=2,
+        collate_fn=collate_val,
         drop_last=False)
-    args.epoch_iters = len(dataset_train) // args.batch_size
+    args.epoch_iters = num_train // args.batch_size
     print('1 Epoch = {} iters'.format(args.epoch_iters))
 
     # Wrap networks
@@ -541,15 +672,28 @@ def main(args):
         'train': {'epoch': [], 'err': []},
         'val': {'epoch': [], 'err': [], 'sdr': [], 'sir': [], 'sar': []}}
 
-    # Eval mode
-    evaluate(netWrapper, loader_val, history, 0, args)
+    if args.mode == 'train' and resuming(args):
+        load_state(nets, optimizer, history, args)
+    else:
+        # Eval mode
+        evaluate(netWrapper, loader_val, history, 0, args)
     if args.mode == 'eval':
         print('Evaluation Done!')
         return
 
-    # Training loop
-    for epoch in range(1, args.num_epoch + 1):
+    # Training loop, resumed runs start at resume_epoch
+    for epoch in range(args.resume_epoch, args.num_epoch + 1):
+        start_batch = args.resume_batch if epoch == args.resume_epoch else 0
+        if args.shards:
+            dataset_train.set_epoch(epoch, start_batch)
+        else:
+            sampler_train.set_epoch(epoch, start_batch * args.batch_size)
         train(netWrapper, loader_train, optimizer, history, epoch, args)
+        if dataset_train.clip_cache is not None:
+            print('Clip cache: {}'.format(dataset_train.clip_cache.summary()))
+        failures = dataset_train.failures.summary()
+        if failures['errors']:
+            print('Failed loads so far: {}'.format(failures))
 
         # Evaluation and visualization
         if epoch % args.eval_epoch == 0:
@@ -562,6 +706,9 @@ def main(args):
         if epoch in args.lr_steps:
             adjust_learning_rate(optimizer, args)
 
+        # the next epoch is where a resumed run would start
+        checkpoint_state(nets, optimizer, history, epoch + 1, 0, args)
+
     print('Training Done!')
 
 
@@ -598,7 +745,8 @@ if __name__ == '__main__':
     args.ckpt = os.path.join(args.ckpt, args.id)
     args.vis = os.path.join(args.ckpt, 'visualization/')
     if args.mode == 'train':
-        makedirs(args.ckpt, remove=True)
+        # a resumed run needs the state saved in its checkpoint dir
+        makedirs(args.ckpt, remove=not resuming(args))
     elif args.mode == 'eval':
         args.weights_sound = os.path.join(args.ckpt, 'sound_best.pth')
         args.weights_frame = os.path.join(args.ckpt, 'frame_best.pth')
@@ -1,24 +1,32 @@
 import os
+import glob
+import shutil
+import argparse
 import subprocess
 
+from dataset.frame_pack import pack_path, write_pack
+from jobs import JobState, run_jobs
+
 # Define input and output directories
 base_dirs = ["downloaded_videos/MUSIC21_solo", "downloaded_videos/MUSIC_duet", "downloaded_videos/MUSIC_solo"]
 output_dir = "data"
 
 # Flag to choose whether to use the new structure
 use_new_structure = True  # Set to False for the original structure
+# Flag to pack the frames of each video into a single <video>.pack file
+pack_frames = False  # Set to True for network filesystems (--frame_mode pack)
 
 # Set new directory paths if using the new structure
 audio_output_dir = os.path.join(output_dir, "eval_audio" if use_new_structure else "audio")
 frames_output_dir = os.path.join(output_dir, "eval_frames" if use_new_structure else "frames")
+# Per-video done/failed/timing, so an interrupted run resumes where it stopped
+state_file = os.path.join(output_dir, "eval_preprocess_state.json" if use_new_structure else "preprocess_state.json")
 
-# Ensure output directories exist
-os.makedirs(audio_output_dir, exist_ok=True)
-os.makedirs(frames_output_dir, exist_ok=True)
 
-def extract_audio_and_frames(instrument, video_file, video_path, audio_path, frames_path):
+def extract_audio_and_frames(instrument, video_file, video_path, audio_path, frames_path, timeout=None):
     """
-    Extract audio waveforms at 11025Hz and frames at 8fps from a video.
+    Extract audio waveforms at 11025Hz and frames at 8fps from a video,
+    decoding it once with a single ffmpeg call.
     """
     # Create output paths for this video
     video_id = video_file  # Keep the file name with the extension for folder naming
@@ -26,58 +34,79 @@ def extract_audio_and_frames(instrument, video_file, video_path, audio_path, fra
     audio_output_file = os.path.join(audio_path, instrument, f"{os.path.splitext(video_file)[0]}.mp3")  # Save audio as MP3
 
     print(f"Processing instrument: {instrument}, video: {video_file}")
-    
-    # Ensure directories exist
+
+    # Start from scratch, a failed attempt may have left partial frames
+    if os.path.isdir(video_frames_path):
+        shutil.rmtree(video_frames_path)
     os.makedirs(video_frames_path, exist_ok=True)
     os.makedirs(os.path.join(audio_path, instrument), exist_ok=True)
-    
-    # Extract frames at 8fps
-    frame_command = [
-        "ffmpeg", "-i", video_path,
-        "-vf", "fps=8",
+
+    # Frames at 8fps and audio at 11025Hz, one output per mapped stream
+    command = [
+        "ffmpeg", "-y", "-i", video_path,
+        "-map", "0:v:0", "-vf", "fps=8",
         os.path.join(video_frames_path, "%06d.jpg"),
-        "-hide_banner", "-loglevel", "error"
-    ]
-    
-    # Extract audio at 11025Hz
-    audio_command = [
-        "ffmpeg", "-i", video_path,
-        "-ar", "11025",
-        "-ac", "1",
-        "-vn",
+        "-map", "0:a:0", "-ar", "11025", "-ac", "1",
         audio_output_file,
         "-hide_banner", "-loglevel", "error"
     ]
-    
-    try:
-        print(f"Extracting frames for {video_file}...")
-        subprocess.run(frame_command, check=True)
-        
-        print(f"Extracting audio for {video_file}...")
-        subprocess.run(audio_command, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error processing {video_file}: {e}")
-
-# Walk through the downloaded videos
-for dir in base_dirs:
-    path = os.path.join(dir, "eval_videos")
-    for instrument in os.listdir(path):
-        instrument_path = os.path.join(path, instrument)
-        if not os.path.isdir(instrument_path):
+    result = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffmpeg exited with {result.returncode}")
+
+    if pack_frames:
+        write_pack(pack_path(video_frames_path),
+                   sorted(glob.glob(os.path.join(video_frames_path, "*.jpg"))))
+        shutil.rmtree(video_frames_path)
+
+
+def find_videos():
+    """(key, args) of every downloaded video, the key being its path.
+    A video id found in several subsets is kept once, as its outputs
+    (frames and mp3) would be written by concurrent jobs."""
+    jobs = []
+    seen = set()
+    for dir in base_dirs:
+        path = os.path.join(dir, "eval_videos")
+        if not os.path.isdir(path):
             continue
-        video_dir = os.path.join(instrument_path, "videos")
-        if os.path.exists(video_dir):
-            for video_file in os.listdir(video_dir):
-                video_path = os.path.join(video_dir, video_file)
+        for instrument in sorted(os.listdir(path)):
+            video_dir = os.path.join(path, instrument, "videos")
+            if not os.path.isdir(video_dir):
+                continue
+            for video_file in sorted(os.listdir(video_dir)):
                 if not video_file.endswith(('.mp4', '.mkv', '.avi')):  # Ensure it's a video file
                     continue
-                
-                # Process videos to extract frames and audio
-                extract_audio_and_frames(
-                    instrument,
-                    video_file,
-                    video_path,
-                    audio_output_dir,
-                    frames_output_dir
-                )
-print("Preprocessing completed.")
+                output = (instrument, os.path.splitext(video_file)[0])
+                if output in seen:
+                    continue
+                seen.add(output)
+                video_path = os.path.join(video_dir, video_file)
+                jobs.append((video_path, (instrument, video_file, video_path,
+                                          audio_output_dir, frames_output_dir)))
+    return jobs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', default=os.cpu_count(), type=int,
+                        help="number of videos processed at once")
+    parser.add_argument('--retries', default=2, type=int,
+                        help="retries of a failed video")
+    parser.add_argument('--timeout', default=600, type=float,
+                        help="seconds before an ffmpeg call is killed")
+    parser.add_argument('--state', default=state_file,
+                        help="state file, delete it to redo every video")
+    args = parser.parse_args()
+
+    os.makedirs(audio_output_dir, exist_ok=True)
+    os.makedirs(frames_output_dir, exist_ok=True)
+
+    def work(*job):
+        extract_audio_and_frames(*job, timeout=args.timeout)
+
+    failed = run_jobs(find_videos(), work, JobState(args.state),
+                      num_workers=args.workers, max_retries=args.retries)
+    print(f"Preprocessing completed, {len(failed)} videos failed.")
+    for video_path in failed:
+        print(f"  {video_path}")
@@ -1,90 +1,141 @@
 import os
 import json
+import shutil
+import argparse
 import subprocess
 
-print("Current Working Directory:", os.getcwd())
+from jobs import JobState, run_jobs
 
-# Define input JSON files
+# Define input JSON files, mapped to their output folder names
+json_folder_map = {
+    "MUSIC_dataset/MUSIC21_solo_videos.json": "MUSIC21_solo",
+    "MUSIC_dataset/MUSIC_duet_videos.json": "MUSIC_duet",
+    "MUSIC_dataset/MUSIC_solo_videos.json": "MUSIC_solo"
+}
 
+# Define output directory
+base_output_dir = "downloaded_videos"
 
-json_files = [
-    "/content/pixels/MUSIC_dataset/MUSIC21_solo_videos.json",
-    "/content/pixels/MUSIC_dataset/MUSIC_duet_videos.json",
-    "/content/pixels/MUSIC_dataset/MUSIC_solo_videos.json"
-]
 
+class YtDlpFetcher(object):
+    """Download a YouTube video as a single mp4 with yt-dlp."""
+    def __init__(self, video_format="bestvideo+bestaudio/best"):
+        self.video_format = video_format
+
+    def __call__(self, video_id, output_path):
+        url = f"https://www.youtube.com/watch?v={video_id}"
+        subprocess.run([
+            "yt-dlp", "-f", self.video_format,
+            "--merge-output-format", "mp4",
+            "--no-part", "--quiet", "--no-warnings",
+            "-o", output_path, url
+        ], check=True, capture_output=True, text=True)
 
-# Define output directory
-base_output_dir = "downloaded_videos"
-# Ensure the base output directory exists
-os.makedirs(base_output_dir, exist_ok=True)
 
-def download_videos(json_file, folder_name):
+class LocalFetcher(object):
+    """Stand-in for yt-dlp, copying <root>/<video_id>.mp4. For tests and
+    for machines that already hold the videos.
     """
-    Download videos and audio based on video IDs from a JSON file,
-    using video IDs as filenames instead of video titles.
+    def __init__(self, root):
+        self.root = root
+
+    def __call__(self, video_id, output_path):
+        shutil.copyfile(os.path.join(self.root, f"{video_id}.mp4"), output_path)
+
+
+def collect_videos(json_folder_map):
+    """{video_id: [(folder_name, category), ...]} over all JSON files.
+
+    The MUSIC lists overlap, each id is downloaded once and linked
+    into every folder listing it.
     """
-    with open(json_file, "r") as f:
-        data = json.load(f)
-    
-    # Create a base directory for the current JSON file
-    json_output_dir = os.path.join(base_output_dir, folder_name)
-    os.makedirs(json_output_dir, exist_ok=True)
-    
-    for category, video_ids in data.get("videos", {}).items():
-        # Create a directory for each category inside the current JSON folder
-        category_dir = os.path.join(json_output_dir, category)
-        video_dir = os.path.join(category_dir, "videos")
-        audio_dir = os.path.join(category_dir, "audio")
-        os.makedirs(video_dir, exist_ok=True)
-        os.makedirs(audio_dir, exist_ok=True)
-        
-        print(f"Downloading videos and audio for category: {category} in {folder_name}")
-        for video_id in video_ids:
-            url = f"https://www.youtube.com/watch?v={video_id}"
-            # Use video_id as filename instead of video title
-            video_output_path = os.path.join(video_dir, f"{video_id}.mp4")
-            audio_output_path = os.path.join(audio_dir, f"{video_id}.mp3")
-            
-            # Download video with best quality
-            video_command = [
-                "yt-dlp",
-                "-f", "bestvideo+bestaudio/best",
-                "--merge-output-format", "mp4",
-                "-o", video_output_path,
-                url
-            ]
-            
-            # Download audio only
-            audio_command = [
-                "yt-dlp",
-                "-f", "bestaudio",
-                "--extract-audio",
-                "--audio-format", "mp3",
-                "-o", audio_output_path,
-                url
-            ]
-            
-            try:
-                print(f"Downloading video {video_id}: {url} to {video_dir}")
-                subprocess.run(video_command, check=True)
-                
-                print(f"Downloading audio {video_id}: {url} to {audio_dir}")
-                subprocess.run(audio_command, check=True)
-            except subprocess.CalledProcessError as e:
-                print(f"Error downloading {video_id} - {url}: {e}")
-
-# Map JSON file names to folder names
+    videos = {}
+    for json_file, folder_name in json_folder_map.items():
+        if not os.path.exists(json_file):
+            print(f"JSON file not found: {json_file}")
+            continue
+        with open(json_file, "r") as f:
+            data = json.load(f)
+        for category, video_ids in data.get("videos", {}).items():
+            for video_id in video_ids:
+                places = videos.setdefault(video_id, [])
+                if (folder_name, category) not in places:
+                    places.append((folder_name, category))
+    return videos
 
-json_folder_map = {
-    "/content/pixels/MUSIC_dataset/MUSIC21_solo_videos.json": "MUSIC21_solo",
-    "/content/pixels/MUSIC_dataset/MUSIC_duet_videos.json": "MUSIC_duet",
-    "/content/pixels/MUSIC_dataset/MUSIC_solo_videos.json": "MUSIC_solo"
-}
 
-# Download videos and audio for each JSON file
-for json_file, folder_name in json_folder_map.items():
-    if os.path.exists(json_file):
-        download_videos(json_file, folder_name)
+def output_paths(folder_name, category, video_id):
+    category_dir = os.path.join(base_output_dir, folder_name, category)
+    return (os.path.join(category_dir, "videos", f"{video_id}.mp4"),
+            os.path.join(category_dir, "audio", f"{video_id}.mp3"))
+
+
+def link(src, dst):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def download_video(video_id, places, fetcher):
+    """
+    Fetch a video once, derive its mp3 locally with ffmpeg, and place
+    both in every folder/category listing the video id.
+    """
+    video_output_path, audio_output_path = output_paths(*places[0], video_id)
+    os.makedirs(os.path.dirname(video_output_path), exist_ok=True)
+    os.makedirs(os.path.dirname(audio_output_path), exist_ok=True)
+
+    # Fetch to a temp name, so a killed run never leaves a truncated mp4
+    if not os.path.exists(video_output_path):
+        tmp = video_output_path + ".tmp.mp4"
+        fetcher(video_id, tmp)
+        os.replace(tmp, video_output_path)
+
+    tmp = audio_output_path + ".tmp.mp3"
+    subprocess.run([
+        "ffmpeg", "-y", "-i", video_output_path, "-vn", "-q:a", "2", tmp,
+        "-hide_banner", "-loglevel", "error"
+    ], check=True, capture_output=True, text=True)
+    os.replace(tmp, audio_output_path)
+
+    for place in places[1:]:
+        video_path, audio_path = output_paths(*place, video_id)
+        link(video_output_path, video_path)
+        link(audio_output_path, audio_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fetcher', default='yt-dlp', choices=['yt-dlp', 'local'],
+                        help="where videos are fetched from")
+    parser.add_argument('--local_root', default='./local_videos',
+                        help="<video_id>.mp4 files for --fetcher local")
+    parser.add_argument('--workers', default=4, type=int,
+                        help="number of videos downloaded at once")
+    parser.add_argument('--retries', default=2, type=int,
+                        help="retries of a failed download")
+    parser.add_argument('--state', default=os.path.join(base_output_dir, "download_state.json"),
+                        help="state file, delete it to redo every video")
+    args = parser.parse_args()
+
+    if args.fetcher == 'local':
+        fetcher = LocalFetcher(args.local_root)
     else:
-        print(f"JSON file not found: {json_file}")
+        fetcher = YtDlpFetcher()
+
+    videos = collect_videos(json_folder_map)
+    print(f"{sum(len(places) for places in videos.values())} listed videos, "
+          f"{len(videos)} unique ids.")
+    jobs = [(video_id, (video_id, places, fetcher))
+            for video_id, places in sorted(videos.items())]
+
+    os.makedirs(base_output_dir, exist_ok=True)
+    failed = run_jobs(jobs, download_video, JobState(args.state),
+                      num_workers=args.workers, max_retries=args.retries)
+    print(f"Downloads completed, {len(failed)} videos failed.")
+    for video_id in failed:
+        print(f"  {video_id}")
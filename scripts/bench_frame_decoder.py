@@ -0,0 +1,74 @@
+import os
+import sys
+import glob
+import time
+import argparse
+
+import numpy as np
+from PIL import Image
+from torchvision.io import decode_jpeg, read_file, ImageReadMode
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dataset import video_transforms as vtransforms
+
+
+def timeit(fn, repeat):
+    fn()
+    tic = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return (time.perf_counter() - tic) / repeat * 1000, out
+
+
+def load_pil(paths, resize, draft):
+    frames = []
+    for path in paths:
+        img = Image.open(path)
+        if draft:
+            img.draft('RGB', (resize.size, resize.size))
+        frames.append(img.convert('RGB'))
+    return resize(frames)
+
+
+def load_torchvision(paths, resize):
+    return resize(decode_jpeg([read_file(path) for path in paths],
+                              mode=ImageReadMode.RGB))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Time the decoding and resizing of the frames of one "
+                    "sample (num_mix x num_frames) and of one batch, "
+                    "PIL against torchvision.io.decode_jpeg.")
+    parser.add_argument('frame_dir',
+                        help="a folder of extracted frames (000001.jpg, ...)")
+    parser.add_argument('--num_mix', default=2, type=int)
+    parser.add_argument('--num_frames', default=3, type=int)
+    parser.add_argument('--imgSize', default=224, type=int)
+    parser.add_argument('--batch_size', default=8, type=int)
+    parser.add_argument('--repeat', default=5, type=int)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.frame_dir, '*.jpg')))
+    sample = args.num_mix * args.num_frames
+    assert len(paths) >= sample, 'not enough frames in ' + args.frame_dir
+    resize = vtransforms.Resize(int(args.imgSize * 1.1), Image.BICUBIC)
+    print('{} frames of {}x{}, resized to {}'.format(
+        sample, *Image.open(paths[0]).size, resize.size))
+
+    for name, num in [('sample', sample), ('batch', sample * args.batch_size)]:
+        batch = [paths[i % len(paths)] for i in range(num)]
+        runs = [('pil', lambda: load_pil(batch, resize, False)),
+                ('pil, jpeg_draft', lambda: load_pil(batch, resize, True)),
+                ('torchvision', lambda: load_torchvision(batch, resize))]
+        ref = None
+        for run, fn in runs:
+            ms, out = timeit(fn, args.repeat)
+            out = np.stack([np.asarray(vtransforms.ToUint8Tensor()([f])[0])
+                            for f in out]).astype(np.float32)
+            if ref is None:
+                ref = out
+            diff = np.abs(out - ref).mean() if out.shape == ref.shape else float('nan')
+            print('  {:6s} {:16s} {:8.2f} ms  {:6.2f} ms/frame  '
+                  'mean |diff| to pil {:.2f}'.format(
+                      name, run, ms, ms / num, diff))
@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import librosa
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dataset.resample import Resampler
+
+
+def snr(x, ref):
+    return 10 * np.log10(np.sum(ref ** 2) / max(np.sum((x - ref) ** 2), 1e-20))
+
+
+def timeit(fn, repeat):
+    fn()
+    tic = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return (time.perf_counter() - tic) / repeat * 1000, out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Time the resampling of one training clip out of a track.")
+    parser.add_argument('--rates', nargs='+', type=int, default=[44100, 48000],
+                        help="source sampling rates")
+    parser.add_argument('--audRate', default=11025, type=int)
+    parser.add_argument('--audLen', default=65535, type=int)
+    parser.add_argument('--seconds', default=120, type=float,
+                        help="length of the source track")
+    parser.add_argument('--batch', default=8, type=int,
+                        help="clips resampled at once in the batched run")
+    parser.add_argument('--repeat', default=5, type=int)
+    args = parser.parse_args()
+
+    resampler = Resampler()
+    rng = np.random.default_rng(0)
+    for rate in args.rates:
+        # band-limited noise, so that aliasing shows in the SNR
+        track = librosa.resample(
+            rng.standard_normal(int(args.seconds * args.audRate)).astype(np.float32),
+            orig_sr=args.audRate, target_sr=rate) * 0.1
+        length = resampler.output_length(len(track), rate, args.audRate)
+        start = length // 2 - args.audLen // 2
+        end = start + args.audLen
+        reference = librosa.resample(track, orig_sr=rate, target_sr=args.audRate,
+                                     res_type='soxr_vhq')[start:end]
+
+        print('{} Hz -> {} Hz, {:.0f}s track, {} sample clip'.format(
+            rate, args.audRate, args.seconds, args.audLen))
+        runs = [('librosa, whole track (old path)',
+                 lambda: librosa.resample(track, orig_sr=rate,
+                                          target_sr=args.audRate)[start:end])]
+        for quality in ['nearest', 'fast', 'hq', 'librosa']:
+            runs.append(('{}, window'.format(quality),
+                         lambda quality=quality: resampler(
+                             track, rate, args.audRate, start, end,
+                             quality=quality)))
+        for name, fn in runs:
+            ms, out = timeit(fn, args.repeat)
+            print('  {:32s} {:8.2f} ms   SNR {:6.1f} dB'.format(
+                name, ms, snr(out, reference)))
+
+        # batched: one call for several same-length windows
+        a, b = resampler.input_range(rate, args.audRate, start, end)
+        windows = np.stack([track[a:b]] * args.batch)
+        ms, _ = timeit(lambda: resampler(windows, rate, args.audRate, start,
+                                         end, offset=a), args.repeat)
+        print('  {:32s} {:8.2f} ms / clip'.format(
+            'hq, batch of {}'.format(args.batch), ms / args.batch))
@@ -0,0 +1,47 @@
+import os
+import sys
+import csv
+import argparse
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dataset.audio_stats import compute_audio_stats, save_audio_stats
+
+
+def stats_or_none(path_audio):
+    try:
+        return path_audio, compute_audio_stats(path_audio)
+    except Exception as e:
+        print('{}: failed: {}'.format(path_audio, e))
+        return path_audio, None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--list', nargs='+',
+                        default=['./data/train.csv', './data/val.csv'],
+                        help="index files listing the audio to scan")
+    parser.add_argument('--path_output', default='./data/audio_stats.csv',
+                        help="output stats file")
+    parser.add_argument('--workers', default=8, type=int,
+                        help="number of decoding processes")
+    args = parser.parse_args()
+
+    paths = []
+    for filename in args.list:
+        for row in csv.reader(open(filename, 'r'), delimiter=','):
+            if len(row) < 2:
+                continue
+            paths.append(row[0])
+    paths = sorted(set(paths))
+    print('{} audio files to scan.'.format(len(paths)))
+
+    stats = {}
+    with Pool(args.workers) as pool:
+        for path_audio, stat in pool.imap_unordered(stats_or_none, paths):
+            if stat is not None:
+                stats[path_audio] = stat
+
+    save_audio_stats(args.path_output, stats)
+    print('{} items saved to {}.'.format(len(stats), args.path_output))
+    print('Done!')
@@ -0,0 +1,68 @@
+import os
+import sys
+import csv
+import argparse
+from functools import partial
+from multiprocessing import Pool
+
+import librosa
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dataset.base import load_audio_file
+from dataset.audio_store import store_path, write_track
+
+
+def convert(path_audio, args):
+    if not args.overwrite and \
+            os.path.exists(store_path(args.audio_store, path_audio)):
+        return path_audio, 'skipped'
+    try:
+        audio_raw, rate = load_audio_file(path_audio)
+        if rate != args.audRate:
+            audio_raw = librosa.resample(
+                audio_raw, orig_sr=rate, target_sr=args.audRate)
+        write_track(args.audio_store, path_audio, audio_raw, args.dtype)
+    except Exception as e:
+        return path_audio, 'failed: {}'.format(e)
+    return path_audio, 'done'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--list', nargs='+',
+                        default=['./data/train.csv', './data/val.csv'],
+                        help="index files listing the audio to convert")
+    parser.add_argument('--audio_store', default='./data/pcm',
+                        help="output root of the PCM store")
+    parser.add_argument('--audRate', default=11025, type=int,
+                        help="sampling rate of the stored tracks")
+    parser.add_argument('--dtype', default='float32',
+                        choices=['float32', 'int16'],
+                        help="sample format of the stored tracks")
+    parser.add_argument('--workers', default=8, type=int,
+                        help="number of decoding processes")
+    parser.add_argument('--overwrite', action='store_true',
+                        help="convert tracks that are already in the store")
+    args = parser.parse_args()
+
+    # unique audio paths over all index files
+    paths = []
+    for filename in args.list:
+        for row in csv.reader(open(filename, 'r'), delimiter=','):
+            if len(row) < 2:
+                continue
+            paths.append(row[0])
+    paths = sorted(set(paths))
+    print('{} audio files to convert.'.format(len(paths)))
+
+    num_failed = 0
+    with Pool(args.workers) as pool:
+        for path_audio, status in pool.imap_unordered(
+                partial(convert, args=args), paths):
+            if status.startswith('failed'):
+                num_failed += 1
+                print('{}: {}'.format(path_audio, status))
+
+    print('{} tracks written to {}, {} failed.'.format(
+        len(paths) - num_failed, args.audio_store, num_failed))
+    print('Done!')
@@ -0,0 +1,86 @@
+import os
+import sys
+import csv
+import argparse
+from functools import partial
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dataset import video_transforms as vtransforms
+from dataset.audio_store import store_path
+from dataset.frame_store import VAL_EXT, write_video
+
+
+def resized_frames(frame_dir, count, resize):
+    for i in range(1, count + 1):
+        img = Image.open(
+            os.path.join(frame_dir, '{:06d}.jpg'.format(i))).convert('RGB')
+        yield np.asarray(resize([img])[0])
+
+
+def read_rows(filenames):
+    """{frame_dir: count} of the videos listed in index files."""
+    rows = {}
+    for filename in filenames:
+        for row in csv.reader(open(filename, 'r'), delimiter=','):
+            if len(row) < 3:
+                continue
+            rows[row[1]] = int(row[2])
+    return rows
+
+
+def convert(job, args):
+    frame_dir, count, size, ext = job
+    if not args.overwrite and \
+            os.path.exists(store_path(args.frame_store, frame_dir, ext)):
+        return frame_dir, 'skipped'
+    # same resize as the training or validation transform, which then
+    # becomes a no-op
+    resize = vtransforms.Resize(size, Image.BICUBIC)
+    try:
+        write_video(args.frame_store, frame_dir, count,
+                    resized_frames(frame_dir, count, resize), ext)
+    except Exception as e:
+        return frame_dir, 'failed: {}'.format(e)
+    return frame_dir, 'done'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--list', nargs='+',
+                        default=['./data/train.csv', './data/val.csv'],
+                        help="index files listing the frame dirs to convert")
+    parser.add_argument('--list_val', nargs='*', default=['./data/val.csv'],
+                        help="index files of the videos also stored at imgSize, "
+                             "read by evaluation")
+    parser.add_argument('--frame_store', default='./data/frames_store',
+                        help="output root of the frame store")
+    parser.add_argument('--imgSize', default=224, type=int,
+                        help="training image size, frames keep 1.1x of it")
+    parser.add_argument('--workers', default=8, type=int,
+                        help="number of decoding processes")
+    parser.add_argument('--overwrite', action='store_true',
+                        help="convert videos that are already in the store")
+    args = parser.parse_args()
+
+    # training size for every video, validation size for val videos
+    jobs = [(frame_dir, count, int(args.imgSize * 1.1), '.npy')
+            for frame_dir, count in sorted(read_rows(args.list).items())]
+    jobs += [(frame_dir, count, args.imgSize, VAL_EXT)
+             for frame_dir, count in sorted(read_rows(args.list_val).items())]
+    print('{} videos to convert.'.format(len(jobs)))
+
+    num_failed = 0
+    with Pool(args.workers) as pool:
+        for frame_dir, status in pool.imap_unordered(
+                partial(convert, args=args), jobs):
+            if status.startswith('failed'):
+                num_failed += 1
+                print('{}: {}'.format(frame_dir, status))
+
+    print('{} videos written to {}, {} failed.'.format(
+        len(jobs) - num_failed, args.frame_store, num_failed))
+    print('Done!')
@@ -1,71 +1,166 @@
 import os
-import glob
+import json
 import argparse
 import random
-import fnmatch
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dataset.frame_pack import FramePack, pack_path
+from dataset.audio_stats import compute_audio_stats
+from dataset.manifest import write_manifest
 
 
 def find_recursive(root_dir, ext='.mp3'):
     files = []
-    for root, dirnames, filenames in os.walk(root_dir):
-        for filename in fnmatch.filter(filenames, '*' + ext):
-            files.append(os.path.join(root, filename))
-    return files
+    stack = [root_dir]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(ext):
+                    files.append(entry.path)
+    return sorted(files)
 
 
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--root_audio', default='./data/audio',
-                        help="root for extracted audio files")
-    parser.add_argument('--root_frame', default='./data/frames',
-                        help="root for extracted video frames")
-    parser.add_argument('--fps', default=8, type=int,
-                        help="fps of video frames")
-    parser.add_argument('--path_output', default='./data',
-                        help="path to output index files")
-    parser.add_argument('--trainset_ratio', default=0.8, type=float,
-                        help="80% for training, 20% for validation")
-    args = parser.parse_args()
+def count_frames(frame_path):
+    # frames are either a dir of JPEGs or a single pack file
+    if os.path.isfile(pack_path(frame_path)):
+        pack = FramePack(pack_path(frame_path))
+        count = len(pack)
+        pack.close()
+        return count
+    if not os.path.isdir(frame_path):
+        return 0
+    with os.scandir(frame_path) as it:
+        return sum(1 for entry in it if entry.name.endswith('.jpg'))
 
+
+def mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def video_key(audio_path, frame_path):
+    # adding/removing frames changes the dir (or pack) mtime
+    return [mtime(audio_path), mtime(frame_path), mtime(pack_path(frame_path))]
+
+
+def index_video(item):
+    audio_path, frame_path, with_stats = item
+    entry = {'key': video_key(audio_path, frame_path),
+             'num_frames': count_frames(frame_path)}
+    if with_stats:
+        try:
+            entry['stats'] = list(compute_audio_stats(audio_path))
+        except Exception as e:
+            print('Failed reading {}: {}'.format(audio_path, e))
+            entry['stats'] = [0, 0, 0, 0.]
+    return frame_path, entry
+
+
+def build_index(args):
     print(f"Resolved root_audio: {os.path.abspath(args.root_audio)}")
     print(f"Resolved root_frame: {os.path.abspath(args.root_frame)}")
 
+    # per-video results of previous runs, reused while mtimes match
+    cache = {}
+    if args.cache and os.path.exists(args.cache):
+        with open(args.cache, 'r') as f:
+            cache = json.load(f)
 
     # find all audio/frames pairs
-    infos = []
-    audio_files = find_recursive(args.root_audio, ext='.mp3')
-    # for audio_path in audio_files:
-    #     print(f"Processing audio file: {audio_path}")
-
-    #     frame_path = audio_path.replace(args.root_audio, args.root_frame).replace('.mp3', '.mp4')
-    #     print(f"Looking for frames in: {frame_path}")
-
-    #     frame_files = glob.glob(frame_path + '/*.jpg')
-    #     print(f"Found {len(frame_files)} frames for {frame_path}")
-
-    #     if len(frame_files) > args.fps * 20:
-    #         infos.append(','.join([audio_path, frame_path, str(len(frame_files))]))
-    #     else:
-    #         print(f"Skipping: {frame_path} (Not enough frames: {len(frame_files)})")
-    
-    for audio_path in audio_files:
+    pairs = []
+    for audio_path in find_recursive(args.root_audio, ext='.mp3'):
         frame_path = audio_path.replace(args.root_audio, args.root_frame) \
                                .replace('.mp3', '.mp4')
-        frame_files = glob.glob(frame_path + '/*.jpg')
-        if len(frame_files) > args.fps * 20:
-            infos.append(','.join([audio_path, frame_path, str(len(frame_files))]))
+        pairs.append((audio_path, frame_path))
+
+    todo = []
+    for audio_path, frame_path in pairs:
+        entry = cache.get(frame_path)
+        if entry is None or entry['key'] != video_key(audio_path, frame_path) \
+                or (args.manifest and 'stats' not in entry):
+            todo.append((audio_path, frame_path, args.manifest))
+    print('{} videos found, {} to (re)index.'.format(len(pairs), len(todo)))
+
+    with ProcessPoolExecutor(args.workers) as pool:
+        for frame_path, entry in pool.map(
+                index_video, todo, chunksize=max(1, len(todo) // (4 * args.workers))):
+            cache[frame_path] = entry
+
+    if args.cache:
+        live = set(frame_path for _, frame_path in pairs)
+        cache = {k: v for k, v in cache.items() if k in live}
+        tmp = args.cache + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp, args.cache)
+
+    write_splits([(audio_path, frame_path, cache[frame_path])
+                  for audio_path, frame_path in pairs], args)
+    print('Done!')
+
+
+def write_splits(infos, args, audio_mode=''):
+    """Write train/val index files for (audio_path, frame_path, entry)
+    tuples, entry holding 'num_frames' and, with --manifest, 'stats'.
+    audio_mode is recorded in the manifests, see write_manifest.
+    Returns the train and val subsets.
+    """
+    infos = [info for info in infos if info[2]['num_frames'] > args.fps * 20]
     print('{} audio/frames pairs found.'.format(len(infos)))
 
-    # split train/val
-    n_train = int(len(infos) * 0.8)
-    random.shuffle(infos)
+    # split train/val, reproducible for a given seed
+    n_train = int(len(infos) * args.trainset_ratio)
+    random.Random(args.seed).shuffle(infos)
     trainset = infos[0:n_train]
     valset = infos[n_train:]
     for name, subset in zip(['train', 'val'], [trainset, valset]):
         filename = '{}.csv'.format(os.path.join(args.path_output, name))
         with open(filename, 'w') as f:
-            for item in subset:
-                f.write(item + '\n')
+            for audio_path, frame_path, entry in subset:
+                f.write(','.join([audio_path, frame_path,
+                                  str(entry['num_frames'])]) + '\n')
         print('{} items saved to {}.'.format(len(subset), filename))
 
-    print('Done!')
+        if args.manifest:
+            filename = '{}.npz'.format(os.path.join(args.path_output, name))
+            rows = [(audio_path, frame_path, entry['num_frames']) +
+                    tuple(entry['stats'])
+                    for audio_path, frame_path, entry in subset]
+            write_manifest(filename, rows, audio_mode)
+            print('{} items saved to {}.'.format(len(rows), filename))
+    return trainset, valset
+
+
+def get_parser(root_audio='./data/audio', root_frame='./data/frames',
+               trainset_ratio=0.8):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root_audio', default=root_audio,
+                        help="root for extracted audio files")
+    parser.add_argument('--root_frame', default=root_frame,
+                        help="root for extracted video frames")
+    parser.add_argument('--fps', default=8, type=int,
+                        help="fps of video frames")
+    parser.add_argument('--path_output', default='./data',
+                        help="path to output index files")
+    parser.add_argument('--trainset_ratio', default=trainset_ratio, type=float,
+                        help="80%% for training, 20%% for validation")
+    parser.add_argument('--seed', default=1234, type=int,
+                        help="seed of the train/val split")
+    parser.add_argument('--cache', default='./data/index_cache.json',
+                        help="per-video results reused across runs, '' to disable")
+    parser.add_argument('--manifest', action='store_true',
+                        help="also write binary train/val.npz manifests "
+                             "with per-file audio metadata")
+    parser.add_argument('--workers', default=8, type=int,
+                        help="number of indexing processes")
+    return parser
+
+
+if __name__ == '__main__':
+    build_index(get_parser().parse_args())
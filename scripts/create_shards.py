@@ -0,0 +1,75 @@
+import os
+import sys
+import random
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from arguments import ArgParser
+from dataset import MUSICMixDataset
+from dataset.frame_store import split_frame_path
+from dataset.shards import ShardWriter
+
+dataset = None
+
+
+def init_worker(args):
+    global dataset
+    dataset = MUSICMixDataset(args.list_train, args, split='train')
+
+
+def read_jpegs(paths):
+    if dataset.frame_packs is not None:
+        frame_dir = split_frame_path(paths[0])[0]
+        return [bytes(jpeg) for jpeg in dataset.frame_packs.read_many(
+            frame_dir, [split_frame_path(path)[1] for path in paths])]
+    return dataset.storage.read_many(paths)
+
+
+def cut_window(job):
+    """A random crop window of a video: info, center time, audio clip
+    and JPEG bytes of its frames."""
+    index, seed = job
+    random.seed(seed)
+    info = list(dataset.list_sample[index])
+    try:
+        path_frames, center_time = dataset._crop_window(info)
+        audio = dataset._load_audio(info[0], center_time, augment=False)
+        jpegs = read_jpegs(path_frames)
+    except Exception as e:
+        return info, 'failed: {}'.format(e)
+    return info, (center_time, audio, jpegs)
+
+
+if __name__ == '__main__':
+    parser = ArgParser()
+    parser.add_train_arguments()
+    parser.parser.add_argument('--windows_per_video', default=8, type=int,
+                               help="random crop windows cut from each video")
+    parser.parser.add_argument('--records_per_shard', default=1000, type=int,
+                               help="crop windows per tar shard")
+    args = parser.parser.parse_args()
+    assert args.shards, 'give the output root with --shards'
+
+    num_videos = len(MUSICMixDataset(args.list_train, args, split='train'))
+    # windows in random order, so that every shard mixes many videos
+    rng = random.Random(args.seed)
+    jobs = [(i, rng.getrandbits(32)) for i in range(num_videos)
+            for _ in range(args.windows_per_video)]
+    rng.shuffle(jobs)
+    print('{} windows of {} videos to cut.'.format(len(jobs), num_videos))
+
+    writer = ShardWriter(args.shards, args, args.records_per_shard)
+    num_failed = 0
+    with Pool(int(args.workers), initializer=init_worker,
+              initargs=(args,)) as pool:
+        for info, result in pool.imap(cut_window, jobs, chunksize=4):
+            if isinstance(result, str):
+                num_failed += 1
+                print('{}: {}'.format(info[1], result))
+                continue
+            writer.write(info, *result)
+    writer.close()
+
+    print('{} windows written to {} shards in {}, {} failed.'.format(
+        len(jobs) - num_failed, len(writer.shards), args.shards, num_failed))
+    print('Done!')
@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dataset.audio_store import store_path, write_track
+from dataset.frame_store import VAL_EXT, write_raw_video
+from jobs import JobState, run_jobs
+from create_index_files import write_splits
+
+
+def find_videos(roots, exts=('.mp4', '.mkv', '.avi', '.webm')):
+    """{'<instrument>/<video_id>': path} of the downloaded videos.
+
+    Videos are found as <instrument>/videos/<id>.mp4 (part_1.py layout)
+    or <instrument>/<id>.mp4; ids shared between subsets are kept once.
+    """
+    videos = {}
+    for root in roots:
+        for dirpath, _, filenames in os.walk(root):
+            instrument = os.path.basename(dirpath)
+            if instrument == 'videos':
+                instrument = os.path.basename(os.path.dirname(dirpath))
+            for filename in sorted(filenames):
+                video_id, ext = os.path.splitext(filename)
+                if ext in exts:
+                    videos.setdefault('{}/{}'.format(instrument, video_id),
+                                      os.path.join(dirpath, filename))
+    return videos
+
+
+def probe_size(video_path):
+    out = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'stream=width,height', '-of', 'json', video_path],
+        capture_output=True, text=True, check=True).stdout
+    stream = json.loads(out)['streams'][0]
+    return stream['width'], stream['height']
+
+
+def resized_size(width, height, size):
+    # same output size as torchvision's Resize(size) on a PIL image
+    if width <= height:
+        return size, int(size * height / width)
+    return int(size * width / height), size
+
+
+def run_ffmpeg(command, timeout):
+    result = subprocess.run(command, capture_output=True, text=True,
+                            timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or
+                           'ffmpeg exited with {}'.format(result.returncode))
+
+
+def ingest(video_path, audio_path, frame_path, args):
+    """Decode one video once, straight into the audio and frame stores."""
+    width, height = resized_size(*probe_size(video_path),
+                                 int(args.imgSize * 1.1))
+    frame_raw = store_path(args.frame_store, frame_path, '.rgb.tmp')
+    audio_raw = store_path(args.audio_store, audio_path, '.f32.tmp')
+    os.makedirs(os.path.dirname(frame_raw), exist_ok=True)
+    os.makedirs(os.path.dirname(audio_raw), exist_ok=True)
+
+    command = [
+        'ffmpeg', '-y', '-i', video_path,
+        '-map', '0:v:0',
+        '-vf', 'fps={},scale={}:{}:flags=bicubic'.format(
+            args.fps, width, height),
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', frame_raw,
+        '-map', '0:a:0', '-ar', str(args.audRate), '-ac', '1',
+        '-f', 'f32le', audio_raw,
+        '-hide_banner', '-loglevel', 'error']
+    try:
+        run_ffmpeg(command, args.timeout)
+
+        audio = np.fromfile(audio_raw, dtype=np.float32)
+        # same normalization as load_audio_file
+        peak = float(np.abs(audio).max()) if len(audio) else 0.
+        if peak > 1.:
+            audio /= peak
+            peak = 1.
+        write_track(args.audio_store, audio_path, audio, args.dtype)
+        num_frames = write_raw_video(
+            args.frame_store, frame_path, frame_raw, height, width)
+    finally:
+        for filename in [frame_raw, audio_raw]:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    # stats of the stored track; its index path is no real file, so the
+    # manifest is marked for --audio_mode store only
+    return {'num_frames': num_frames,
+            'stats': [args.audRate, len(audio), 1, peak]}
+
+
+def ingest_val_frames(video_path, frame_path, args):
+    """Frames of one validation video once more, at imgSize, so that
+    evaluation does not resize the training frames a second time."""
+    width, height = resized_size(*probe_size(video_path), args.imgSize)
+    frame_raw = store_path(args.frame_store, frame_path, '.val.rgb.tmp')
+    command = [
+        'ffmpeg', '-y', '-i', video_path,
+        '-map', '0:v:0',
+        '-vf', 'fps={},scale={}:{}:flags=bicubic'.format(
+            args.fps, width, height),
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', frame_raw,
+        '-hide_banner', '-loglevel', 'error']
+    try:
+        run_ffmpeg(command, args.timeout)
+        write_raw_video(args.frame_store, frame_path, frame_raw,
+                        height, width, VAL_EXT)
+    finally:
+        if os.path.exists(frame_raw):
+            os.remove(frame_raw)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root_video', nargs='+',
+                        default=['./downloaded_videos'],
+                        help="roots of the downloaded videos")
+    parser.add_argument('--root_audio', default='./data/audio',
+                        help="audio root written in the index files")
+    parser.add_argument('--root_frame', default='./data/frames',
+                        help="frames root written in the index files")
+    parser.add_argument('--audio_store', default='./data/pcm',
+                        help="output root of the PCM store")
+    parser.add_argument('--frame_store', default='./data/frames_store',
+                        help="output root of the frame store")
+    parser.add_argument('--audRate', default=11025, type=int,
+                        help="sampling rate of the stored tracks")
+    parser.add_argument('--dtype', default='float32',
+                        choices=['float32', 'int16'],
+                        help="sample format of the stored tracks")
+    parser.add_argument('--fps', default=8, type=int,
+                        help="fps of video frames")
+    parser.add_argument('--imgSize', default=224, type=int,
+                        help="training image size, frames keep 1.1x of it")
+    parser.add_argument('--path_output', default='./data',
+                        help="path to output index files")
+    parser.add_argument('--trainset_ratio', default=0.8, type=float,
+                        help="80%% for training, 20%% for validation")
+    parser.add_argument('--seed', default=1234, type=int,
+                        help="seed of the train/val split")
+    parser.add_argument('--workers', default=os.cpu_count(), type=int,
+                        help="number of videos ingested at once")
+    parser.add_argument('--retries', default=2, type=int,
+                        help="retries of a failed video")
+    parser.add_argument('--timeout', default=600, type=float,
+                        help="seconds before an ffmpeg call is killed")
+    parser.add_argument('--state', default='./data/ingest_state.json',
+                        help="state file, delete it to redo every video")
+    args = parser.parse_args()
+    args.manifest = True
+
+    videos = find_videos(args.root_video)
+    # index paths as create_index_files.py would write them; nothing is
+    # stored there, the loaders map them to the stores
+    paths = {key: (os.path.join(args.root_audio, key + '.mp3'),
+                   os.path.join(args.root_frame, key + '.mp4'))
+             for key in videos}
+    jobs = [(key, (videos[key],) + paths[key] + (args,))
+            for key in sorted(videos)]
+
+    state = JobState(args.state)
+    failed = run_jobs(jobs, ingest, state,
+                      num_workers=args.workers, max_retries=args.retries)
+    print('{} videos failed.'.format(len(failed)))
+
+    _, valset = write_splits([paths[key] + (state.jobs[key],)
+                              for key in sorted(videos) if state.is_done(key)],
+                             args, audio_mode='store')
+
+    # validation videos also at their evaluation size
+    keys = {paths[key][1]: key for key in videos}
+    jobs = [(keys[frame_path] + VAL_EXT,
+             (videos[keys[frame_path]], frame_path, args))
+            for _, frame_path, _ in valset]
+    failed = run_jobs(jobs, ingest_val_frames, state,
+                      num_workers=args.workers, max_retries=args.retries)
+    print('{} validation videos failed.'.format(len(failed)))
+    print('Train with --audio_mode store --audio_store {} '
+          '--frame_mode store --frame_store {}'.format(
+              args.audio_store, args.frame_store))
+    print('Done!')
@@ -0,0 +1,56 @@
+import os
+import sys
+import glob
+import shutil
+import argparse
+from functools import partial
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dataset.frame_pack import pack_path, write_pack
+
+
+def find_frame_dirs(root_frame):
+    # frame dirs are named after the video, e.g. <instrument>/<id>.mp4
+    frame_dirs = []
+    for root, dirnames, filenames in os.walk(root_frame):
+        if any(filename.endswith('.jpg') for filename in filenames):
+            frame_dirs.append(root)
+    return frame_dirs
+
+
+def pack(frame_dir, args):
+    try:
+        write_pack(pack_path(frame_dir),
+                   sorted(glob.glob(os.path.join(frame_dir, '*.jpg'))))
+        if args.remove:
+            shutil.rmtree(frame_dir)
+    except Exception as e:
+        return frame_dir, 'failed: {}'.format(e)
+    return frame_dir, 'done'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root_frame', default='./data/frames',
+                        help="root for extracted video frames")
+    parser.add_argument('--workers', default=8, type=int,
+                        help="number of packing processes")
+    parser.add_argument('--remove', action='store_true',
+                        help="delete the JPEG dirs once packed")
+    args = parser.parse_args()
+
+    frame_dirs = find_frame_dirs(args.root_frame)
+    print('{} frame dirs found.'.format(len(frame_dirs)))
+
+    num_failed = 0
+    with Pool(args.workers) as pool:
+        for frame_dir, status in pool.imap_unordered(
+                partial(pack, args=args), frame_dirs):
+            if status.startswith('failed'):
+                num_failed += 1
+                print('{}: {}'.format(frame_dir, status))
+
+    print('{} videos packed, {} failed.'.format(
+        len(frame_dirs) - num_failed, num_failed))
+    print('Done!')
@@ -0,0 +1,104 @@
+import os
+import sys
+import glob
+import time
+import logging
+import tempfile
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from arguments import ArgParser
+from dataset import MUSICMixDataset
+from dataset.frame_pack import pack_path
+from dataset.storage import S3Storage
+
+
+def start_stand_in():
+    """A local S3 compatible server (moto), for when no endpoint is given."""
+    from moto.server import ThreadedMotoServer
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    return server, 'http://{}:{}'.format(host, port)
+
+
+def upload(storage, rows, frame_mode):
+    """Put the audio files and frames of rows under their keys."""
+    client = storage.client
+    buckets = [b['Name'] for b in client.list_buckets()['Buckets']]
+    if storage.bucket not in buckets:
+        client.create_bucket(Bucket=storage.bucket)
+    paths = []
+    for row in rows:
+        paths.append(row[0])
+        if frame_mode == 'pack':
+            paths.append(pack_path(row[1]))
+        else:
+            paths.extend(sorted(glob.glob(os.path.join(row[1], '*.jpg'))))
+    for path in paths:
+        client.upload_file(path, storage.bucket, storage.key(path))
+    return len(paths)
+
+
+def compare(dataset_a, dataset_b, num_items):
+    for i in range(num_items):
+        a, b = dataset_a[i], dataset_b[i]
+        for key in a:
+            values_a, values_b = a[key], b[key]
+            if not isinstance(values_a, list):
+                values_a, values_b = [values_a], [values_b]
+            for x, y in zip(values_a, values_b):
+                if torch.is_tensor(x) and not torch.equal(x, y):
+                    raise AssertionError('item {} differs in {}'.format(i, key))
+
+
+if __name__ == '__main__':
+    parser = ArgParser()
+    parser.add_train_arguments()
+    parser.parser.add_argument('--num_items', default=4, type=int,
+                               help="validation items compared")
+    args = parser.parser.parse_args()
+    args.num_val = args.num_items
+    args.batch_size = 2
+
+    server = None
+    if not args.storage_endpoint:
+        server, args.storage_endpoint = start_stand_in()
+        print('Local S3 stand-in at {}'.format(args.storage_endpoint))
+    url = args.storage or 's3://sop-smoke/corpus'
+
+    # reference items from local paths
+    args.storage = ''
+    local = MUSICMixDataset(args.list_val, args, max_sample=args.num_items,
+                            split='val')
+    storage = S3Storage(url, args.storage_endpoint)
+    print('Uploaded {} objects to {}'.format(
+        upload(storage, local.list_sample[:], args.frame_mode), url))
+
+    # the same items, everything read from the store
+    args.storage = url
+    for cache in ['', tempfile.mkdtemp()]:
+        args.storage_cache = cache
+        remote = MUSICMixDataset(args.list_val, args,
+                                 max_sample=args.num_items, split='val')
+        for run in ['first', 'second']:
+            tic = time.perf_counter()
+            compare(local, remote, args.num_items)
+            print('cache {!r}, {} pass: {} items equal, {:.2f}s, '
+                  '{} requests, {} KB'.format(
+                      cache, run, args.num_items, time.perf_counter() - tic,
+                      remote.storage.num_requests,
+                      remote.storage.num_bytes >> 10))
+
+    # each worker opens its own client
+    loader = torch.utils.data.DataLoader(remote, batch_size=2, num_workers=2)
+    print('{} batches through 2 workers'.format(sum(1 for _ in loader)))
+
+    if server is not None:
+        server.stop()
+    print('Done!')